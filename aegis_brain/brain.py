@@ -1,46 +1,215 @@
 import os
+import re
 import logging
 import time
 import json
-import requests
-import yaml
+import asyncio
+import bisect
+import functools
+import random
+import signal
+import httpx
+import orjson
 from google import genai
 from google.genai import types
+from google.genai import errors as genai_errors
 
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from memory_manager import MemoryManager
 from strategy_evolver import EvolutionEngine
 
+try:
+    from ciso8601 import parse_datetime as parse_iso
+except ImportError:  # pure-Python fallback, same semantics for Freqtrade timestamps
+    parse_iso = datetime.fromisoformat
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("AEGIS_Brain")
 
+def _resolve_config_path(config_path):
+    if not os.path.isabs(config_path):
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        config_path = os.path.join(base_dir, config_path)
+    return config_path
+
+# Parsed configs keyed by absolute path -> ((mtime_ns, size), data), least recently used first
+_CONFIG_LRU = OrderedDict()
+_CONFIG_LRU_MAX = 100
+
+def _read_config_file(config_path, st):
+    """
+    Parses a YAML config, preferring the JSON sidecar written after the last parse
+    when it was made from this exact file version (json.load is much cheaper than YAML).
+    """
+    sidecar = config_path + ".json"
+    source = [st.st_mtime_ns, st.st_size]
+    try:
+        with open(sidecar, 'r') as file:
+            cached = json.load(file)
+        if cached.get("source") == source:
+            return cached["data"]
+    except (OSError, ValueError, AttributeError, KeyError):
+        pass
+
+    with open(config_path, 'r') as file:
+        # Imported here: with a fresh sidecar the process never needs PyYAML at all
+        import yaml
+        # libyaml's C loader when available; the pure-Python SafeLoader otherwise
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        data = yaml.load(file, Loader=loader) or {}
+    # Only trusted if the YAML is still the version stat'ed before parsing
+    after = os.stat(config_path)
+    if [after.st_mtime_ns, after.st_size] != source:
+        return data
+    tmp = f"{sidecar}.tmp.{os.getpid()}"
+    try:
+        serialized = json.dumps({"source": source, "data": data})
+        with open(tmp, 'w') as file:
+            file.write(serialized)
+        os.replace(tmp, sidecar)
+    except (OSError, TypeError, ValueError) as e:
+        logger.debug(f"Skipping config JSON cache for {config_path}: {e}")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+    return data
+
+def _load_config_cached(config_path):
+    """load_config without the error handling: raises if the file can't be read or parsed."""
+    st = os.stat(config_path)
+    version = (st.st_mtime_ns, st.st_size)
+    cached = _CONFIG_LRU.get(config_path)
+    if cached is not None and cached[0] == version:
+        _CONFIG_LRU.move_to_end(config_path)
+        return cached[1]
+
+    data = _read_config_file(config_path, st)
+    _CONFIG_LRU[config_path] = (version, data)
+    _CONFIG_LRU.move_to_end(config_path)
+    while len(_CONFIG_LRU) > _CONFIG_LRU_MAX:
+        _CONFIG_LRU.popitem(last=False)
+    return data
+
 def load_config(config_path="config.yaml"):
+    """
+    Loads a YAML config, parsing each file version (mtime + size) only once.
+    Callers must treat the returned dict as read-only; it is shared.
+    """
+    config_path = _resolve_config_path(config_path)
     try:
-        if not os.path.isabs(config_path):
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            config_path = os.path.join(base_dir, config_path)
-            
-        with open(config_path, 'r') as file:
-            return yaml.safe_load(file)
+        return _load_config_cached(config_path)
     except Exception as e:
         logger.error(f"Failed to load config from {config_path}: {e}")
         return {}
 
-CONFIG = load_config()
+_CONFIG_PATH = _resolve_config_path("config.yaml")
+_CONFIG_CACHE = {"version": None, "data": {}}
+
+def get_config() -> dict:
+    """
+    Returns the parsed config, re-reading the YAML only when its mtime or size changes.
+    The same dict object is updated in place so references to CONFIG stay live.
+    A file that fails to parse (e.g. caught mid-save) keeps the previous config; it is
+    read again on the next call.
+    """
+    try:
+        st = os.stat(_CONFIG_PATH)
+    except OSError:
+        return _CONFIG_CACHE["data"]
+
+    version = (st.st_mtime_ns, st.st_size)
+    if version != _CONFIG_CACHE["version"]:
+        try:
+            loaded = _load_config_cached(_CONFIG_PATH)
+        except Exception as e:
+            logger.error(f"Failed to load config from {_CONFIG_PATH}, keeping the previous one: {e}")
+            return _CONFIG_CACHE["data"]
+        data = _CONFIG_CACHE["data"]
+        data.clear()
+        data.update(loaded)
+        _CONFIG_CACHE["version"] = version
+        logger.info(f"Loaded config from {_CONFIG_PATH}")
+    return _CONFIG_CACHE["data"]
+
+CONFIG = get_config()
+
+# Outermost {...} block in an LLM answer, with or without markdown fences
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.S)
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.S)
+
+@functools.lru_cache(maxsize=4096)
+def iso_to_epoch(value: str) -> float:
+    """Parses an ISO-8601 timestamp to epoch seconds. Trade times repeat every cycle, so memoize."""
+    return parse_iso(value).timestamp()
+
+# HTTP statuses worth retrying: rate limiting and transient server-side failures
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# How long shutdown waits for an in-flight Operation EVO before leaving it running (seconds)
+EVO_SHUTDOWN_TIMEOUT = 30
+
+def is_transient_http_error(e: Exception) -> bool:
+    """True for connection-level failures and retryable HTTP statuses."""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in RETRYABLE_STATUS
+    return isinstance(e, httpx.TransportError)
+
+def is_transient_genai_error(e: Exception) -> bool:
+    """
+    True for Gemini server errors; bad requests are not retried. Neither is quota (429):
+    the free tier's per-minute window outlasts any retry here and the daily one the whole
+    day, so the next cycle tries again instead.
+    """
+    if isinstance(e, genai_errors.APIError):
+        return e.code in RETRYABLE_STATUS and e.code != 429
+    return isinstance(e, (httpx.TransportError, asyncio.TimeoutError))
+
+def retry_operation(max_retries=3, delay=1, max_delay=8, retry_if=None, timeout=None):
+    """
+    Retries the wrapped function with capped exponential backoff and jitter.
+    If `retry_if` is given, exceptions it rejects are raised immediately.
+    For coroutines, `timeout` bounds each attempt (seconds).
+    """
+    def backoff(attempt):
+        return min(delay * (2 ** attempt) + random.uniform(0, 0.25), max_delay)
+
+    def should_retry(attempt, e):
+        if retry_if is not None and not retry_if(e):
+            return False
+        if attempt == max_retries - 1:
+            logger.error(f"Operation failed after {max_retries} attempts: {e}")
+            return False
+        return True
 
-def retry_operation(max_retries=3, delay=2):
     def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                for i in range(max_retries):
+                    try:
+                        return await asyncio.wait_for(func(*args, **kwargs), timeout)
+                    except Exception as e:
+                        if not should_retry(i, e):
+                            raise e
+                        wait = backoff(i)
+                        logger.warning(f"Operation failed, retrying in {wait:.1f}s... ({i+1}/{max_retries})")
+                        await asyncio.sleep(wait)
+            return async_wrapper
+
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
             for i in range(max_retries):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    if i == max_retries - 1:
-                        logger.error(f"Operation failed after {max_retries} attempts: {e}")
+                    if not should_retry(i, e):
                         raise e
-                    logger.warning(f"Operation failed, retrying in {delay}s... ({i+1}/{max_retries})")
-                    time.sleep(delay)
+                    wait = backoff(i)
+                    logger.warning(f"Operation failed, retrying in {wait:.1f}s... ({i+1}/{max_retries})")
+                    time.sleep(wait)
         return wrapper
     return decorator
 
@@ -50,25 +219,42 @@ class MCPClient:
     """
     def __init__(self, base_url):
         self.base_url = base_url
+
+        # One pooled async client for the process lifetime so TCP handshakes are
+        # amortized across cycles; the transport retries failed connects.
+        # There is a single upstream and a handful of calls per cycle, so a small pool is enough.
+        limits = httpx.Limits(max_connections=8, max_keepalive_connections=4)
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            transport=httpx.AsyncHTTPTransport(retries=3, limits=limits),
+            timeout=httpx.Timeout(30, connect=3),
+            headers={"Connection": "keep-alive"},
+        )
         logger.info(f"MCP Client initialized for {self.base_url}")
 
-    @retry_operation(max_retries=3, delay=2)
-    def list_tools(self):
+    async def aclose(self):
+        """Closes the pooled HTTP connections."""
+        await self.client.aclose()
+
+    @retry_operation(max_retries=3, delay=0.5, retry_if=is_transient_http_error)
+    async def list_tools(self):
         try:
-            resp = requests.get(f"{self.base_url}/tools")
+            resp = await self.client.get("/tools", timeout=httpx.Timeout(10, connect=3))
+            resp.raise_for_status()
             return resp.json()
         except Exception as e:
             logger.error(f"Failed to list tools: {e}")
             raise e
 
-    @retry_operation(max_retries=3, delay=2)
-    def call_tool(self, tool_name, arguments={}):
+    @retry_operation(max_retries=3, delay=0.5, retry_if=is_transient_http_error)
+    async def call_tool(self, tool_name, arguments={}):
         try:
             payload = {
                 "name": tool_name,
                 "arguments": arguments
             }
-            resp = requests.post(f"{self.base_url}/tools/call", json=payload)
+            resp = await self.client.post("/tools/call", json=payload)
+            resp.raise_for_status()
             data = resp.json()
             
             # MCP returns a list of content objects, e.g., [{"type": "text", "text": "..."}]
@@ -79,8 +265,8 @@ class MCPClient:
                         content_text = item.get("text", "")
                         try:
                             # Try to parse the inner JSON string from Freqtrade
-                            return json.loads(content_text)
-                        except json.JSONDecodeError:
+                            return orjson.loads(content_text)
+                        except orjson.JSONDecodeError:
                             # If not JSON, return the raw text
                             return content_text
             
@@ -89,110 +275,226 @@ class MCPClient:
             logger.error(f"Failed to call tool {tool_name}: {e}")
             raise e
 
+class MacroContextCache:
+    """
+    Holds the last grounded macro answer. It is reused until it is older than the TTL
+    (or a caller-supplied maximum age).
+    """
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._data = None
+        self._cached_at = 0.0
+
+    def get(self, max_age: float = None):
+        """Returns the cached answer, or None if there is none young enough."""
+        if max_age is None:
+            max_age = self.ttl
+        if self._data is not None and time.monotonic() - self._cached_at < max_age:
+            return self._data
+        return None
+
+    def set(self, data: dict):
+        self._data = data
+        self._cached_at = time.monotonic()
+
 class GeminiClient:
     """
     Wrapper for Google GenAI SDK v2.
     """
-    def __init__(self, api_key):
+    # Static instructions, sent as the system instruction apart from the per-call turn
+    MACRO_INSTRUCTION = """
+        Search for the latest news on:
+        1. Crypto market regulation (SEC, EU, etc.)
+        2. Bitcoin price volatility reasons today
+        3. Federal Reserve interest rate news or global macro events
+
+        Analyze the search results and provide a JSON response with:
+        - "sentiment_score": A float between -1.0 (Very Bearish) and 1.0 (Very Bullish).
+        - "risk_event": Boolean. True ONLY if there is a MAJOR catastrophic event.
+        - "reasoning": A brief summary of why.
+        """
+    MARKET_INSTRUCTION = """
+        You are a crypto trading strategist.
+        Analyze the CURRENT MARKET CONTEXT and MEMORY (PAST LESSONS) you are given
+        and provide a recommendation.
+        """
+
+    def __init__(self, api_key, client=None):
         self.api_key = api_key
+        # Half a cycle by default: a cycle re-run after an error (error_interval later) reuses
+        # the answer, while every scheduled cycle still searches fresh news.
+        config = get_config()
+        macro_ttl = config.get('macro_ttl', config.get('cycle_interval', 300) / 2)
+        self._macro_cache = MacroContextCache(macro_ttl)
+        # Caps in-flight Gemini requests to stay inside the API's concurrency limits
+        self._semaphore = asyncio.Semaphore(2)
         if not api_key:
             logger.warning("GEMINI_API_KEY not set. Running in mock mode.")
         else:
-            self.client = genai.Client(api_key=api_key)
+            self.client = client or genai.Client(api_key=api_key)
             self.model_name = "gemini-2.5-flash"
             logger.info(f"Initialized Gemini Client (v2) for model: {self.model_name}")
 
-    @retry_operation(max_retries=3, delay=5)
-    def analyze_macro_context(self) -> dict:
+    async def _generate(self, instruction: str, contents: str, tools=None):
+        """
+        Runs generate_content with the static instruction as the system instruction.
+        No explicit context cache: these instructions are far below the model's minimum
+        cacheable size, so caches.create would only add a failing request per cycle.
+        """
+        async with self._semaphore:
+            return await self.client.aio.models.generate_content(
+                model=self.model_name,
+                contents=contents,
+                config=types.GenerateContentConfig(system_instruction=instruction, tools=tools)
+            )
+
+    @retry_operation(max_retries=3, delay=1, retry_if=is_transient_genai_error, timeout=60)
+    async def analyze_macro_context(self, max_age: float = None) -> dict:
         """
         Performs a grounded search for macro-economic and crypto news.
+
+        Args:
+            max_age: Oldest cached result (seconds) the caller accepts. Defaults to macro_ttl.
         """
         if not hasattr(self, 'client'):
             return {"score": 0.0, "risk_event": False, "reasoning": "Mock Mode"}
 
-        prompt = """
-        Search for the latest news on:
-        1. Crypto market regulation (SEC, EU, etc.)
-        2. Bitcoin price volatility reasons today
-        3. Federal Reserve interest rate news or global macro events
+        cached = self._macro_cache.get(max_age)
+        if cached is not None:
+            logger.info("Macro Analysis: using cached result")
+            return cached
 
-        Analyze the search results and provide a JSON response with:
-        - "sentiment_score": A float between -1.0 (Very Bearish) and 1.0 (Very Bullish).
-        - "risk_event": Boolean. True ONLY if there is a MAJOR catastrophic event.
-        - "reasoning": A brief summary of why.
-        """
-        
         # New SDK Tool Configuration
         tool = types.Tool(google_search=types.GoogleSearch())
-        config = types.GenerateContentConfig(tools=[tool])
+        now = datetime.now(timezone.utc).isoformat(timespec='minutes')
 
         try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config=config
+            response = await self._generate(
+                self.MACRO_INSTRUCTION, f"Current time (UTC): {now}", tools=[tool]
             )
             
-            text = response.text
-            # Strip markdown code blocks if present
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0]
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0]
-            
-            data = json.loads(text)
+            # Grounded search can't be combined with a JSON response schema, so pull
+            # the outermost object out of the free-form (possibly fenced) answer.
+            match = _JSON_OBJECT_RE.search(response.text or "")
+            if not match:
+                raise ValueError(f"No JSON object in macro response: {response.text!r}")
+            data = orjson.loads(match.group(0))
             logger.info(f"Macro Analysis: {data}")
+            self._macro_cache.set(data)
             return data
         except Exception as e:
             logger.error(f"Macro analysis failed: {e}")
             raise e
 
-    @retry_operation(max_retries=3, delay=5)
-    def analyze_market(self, context: dict, memory_context: str = "") -> str:
+    @retry_operation(max_retries=3, delay=1, retry_if=is_transient_genai_error, timeout=60)
+    async def analyze_macro_contexts(self, prompts: list) -> list:
+        """
+        Answers several macro questions (e.g. one per pair) with a single grounded call.
+        Returns one {"sentiment_score", "risk_event", "reasoning"} dict per prompt, in order.
+        """
+        if not hasattr(self, 'client'):
+            return [{"score": 0.0, "risk_event": False, "reasoning": "Mock Mode"} for _ in prompts]
+        if not prompts:
+            return []
+
+        numbered = "\n".join(f"{i}. {p}" for i, p in enumerate(prompts, 1))
+        contents = f"""
+        Search for the latest news relevant to each of the following {len(prompts)} numbered questions:
+        {numbered}
+
+        Return a JSON array of exactly {len(prompts)} objects, in the same order, each with:
+        - "sentiment_score": A float between -1.0 (Very Bearish) and 1.0 (Very Bullish).
+        - "risk_event": Boolean. True ONLY if there is a MAJOR catastrophic event.
+        - "reasoning": A brief summary of why.
+        """
+        tool = types.Tool(google_search=types.GoogleSearch())
+
+        try:
+            async with self._semaphore:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=contents,
+                    config=types.GenerateContentConfig(tools=[tool])
+                )
+
+            match = _JSON_ARRAY_RE.search(response.text or "")
+            if not match:
+                raise ValueError(f"No JSON array in macro response: {response.text!r}")
+            data = orjson.loads(match.group(0))
+            if not isinstance(data, list) or len(data) != len(prompts):
+                raise ValueError(f"Expected {len(prompts)} macro answers, got: {data!r}")
+            logger.info(f"Batched Macro Analysis: {len(data)} answers")
+            return data
+        except Exception as e:
+            logger.error(f"Batched macro analysis failed: {e}")
+            raise e
+
+    @retry_operation(max_retries=3, delay=1, retry_if=is_transient_genai_error, timeout=60)
+    async def analyze_market(self, context: dict, memory_context: str = "") -> str:
         """
         Sends market context to Gemini and gets a strategic assessment.
         """
         if not hasattr(self, 'client'):
             return "MARKET_RISK_LOW: Proceed with standard strategy."
             
-        prompt = f"""
-        You are a crypto trading strategist.
-        
+        contents = f"""
         CURRENT MARKET CONTEXT:
-        {json.dumps(context)}
+        {orjson.dumps(context).decode()}
         
         MEMORY (PAST LESSONS):
         {memory_context}
-        
-        Analyze the situation and provide a recommendation.
         """
         try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt
-            )
+            response = await self._generate(self.MARKET_INSTRUCTION, contents)
             return response.text
         except Exception as e:
             logger.error(f"Market analysis failed: {e}")
             raise e
 
 class AegisStrategist:
-    def __init__(self):
+    # RSI bands used to tag market snapshots for RAG retrieval
+    RSI_HIGH_THRESH = 70
+    RSI_LOW_THRESH = 30
+
+    def __init__(self, clock=None):
+        # Current UTC time; injectable so the schedule can be tested at fixed instants
+        self._now = clock or (lambda: datetime.now(timezone.utc))
+        api_key = os.getenv("GEMINI_API_KEY")
+        # One SDK client (one HTTP pool, one auth path) shared with the evolution engine
+        genai_client = genai.Client(api_key=api_key) if api_key else None
         self.memory = MemoryManager()
-        self.gemini = GeminiClient(os.getenv("GEMINI_API_KEY"))
+        self.gemini = GeminiClient(api_key, client=genai_client)
         self.mcp = MCPClient(os.getenv("MCP_SERVER_URL", "http://mcp_wrapper:8000"))
-        self.evolver = EvolutionEngine(os.getenv("GEMINI_API_KEY"))
-        self.last_evolution_check = datetime.now()
+        self.evolver = EvolutionEngine(api_key, client=genai_client)
+        # Persisted so a restart inside the evolution window neither re-runs nor skips EVO
+        last_check = self.memory.get_kv("last_evolution_check")
+        self.last_evolution_check = (
+            parse_iso(last_check) if last_check
+            else datetime(1970, 1, 1, tzinfo=timezone.utc)
+        )
 
-    def reconcile_outcomes(self):
+    async def close(self, close_memory: bool = True):
+        """
+        Releases network and database resources. Call once the main loop has stopped;
+        pass close_memory=False while an EVO worker thread may still be writing to the DB.
+        """
+        await self.mcp.aclose()
+        if close_memory:
+            self.memory.close()
+
+    async def reconcile_outcomes(self):
         """
         Matches past snapshots with closed trades to reinforce learning.
         """
         logger.info("Running reconciliation...")
+
+        # Nothing pending (the steady state): skip the MCP round trip entirely
+        if not self.memory.has_unreconciled_snapshots():
+            return
         
         # 1. Fetch Closed Trades via MCP
         # Tool name updated to 'fetch_trades' per Kukapay docs
-        trades_response = self.mcp.call_tool("fetch_trades", {})
+        trades_response = await self.mcp.call_tool("fetch_trades", {})
         
         # Assuming response structure based on typical MCP/Freqtrade API
         # If it returns a list directly or a dict with 'trades' key
@@ -208,102 +510,153 @@ class AegisStrategist:
             logger.warning("No trades fetched for reconciliation.")
             return
 
-        unreconciled_snapshots = self.memory.get_unreconciled_snapshots()
+        # Parse every trade's open time once (as epoch seconds) and sort, so each
+        # snapshot only needs a binary search instead of a scan over all trades.
+        # Assuming trade has 'open_date' or 'open_timestamp'
+        # Freqtrade API usually returns 'open_date'
+        trade_times = sorted(
+            ((iso_to_epoch(t.get('open_date') or t.get('open_timestamp')), t)
+             for t in trades if t.get('open_date') or t.get('open_timestamp')),
+            key=lambda tt: tt[0]
+        )
+        keys = [tt[0] for tt in trade_times]
+        if not keys:
+            return
+        match_window = 1800.0 # seconds
+
+        # Snapshots older than the earliest trade minus the window can never match
+        unreconciled_snapshots = self.memory.get_unreconciled_snapshots(since=keys[0] - match_window)
+        matches = []
 
         for snapshot in unreconciled_snapshots:
-            # snapshot structure: (id, timestamp, metrics, tag, decision, reasoning, score, reconciled)
+            # snapshot structure: (id, timestamp, snap_ts)
             snap_id = snapshot[0]
-            snap_time_str = snapshot[1]
-            snap_time = datetime.fromisoformat(snap_time_str)
-
-            for trade in trades:
-                # Assuming trade has 'open_date' or 'open_timestamp'
-                # Freqtrade API usually returns 'open_date'
-                open_date_str = trade.get('open_date') or trade.get('open_timestamp')
-                if not open_date_str:
-                    continue
-                    
-                trade_open_time = datetime.fromisoformat(open_date_str)
-                
-                # Match: Snapshot must be within 30 mins BEFORE trade open
-                time_diff = trade_open_time - snap_time
-                if timedelta(seconds=0) <= time_diff <= timedelta(minutes=30):
-                    # Found a match!
-                    profit = trade.get('profit_ratio', 0.0)
-                    score = 1.0 if profit > 0 else -1.0
-                    
-                    self.memory.update_snapshot_outcome(snap_id, score)
-                    self.memory.store_trade(trade, snap_id)
-                    logger.info(f"Reconciled Snapshot {snap_id} with Trade {trade.get('trade_id')} (Profit: {profit})")
-                    break
+            snap_ts = snapshot[2]
+
+            # Match: Snapshot must be within 30 mins BEFORE trade open.
+            # The first trade opened at/after the snapshot is the only candidate.
+            lo = bisect.bisect_left(keys, snap_ts)
+            if lo == len(keys) or keys[lo] - snap_ts > match_window:
+                continue
+
+            # Found a match!
+            trade = trade_times[lo][1]
+            profit = trade.get('profit_ratio', 0.0)
+            score = 1.0 if profit > 0 else -1.0
+
+            matches.append((snap_id, score, trade))
+            logger.info(f"Reconciled Snapshot {snap_id} with Trade {trade.get('trade_id')} (Profit: {profit})")
+
+        # Flush all matches in one transaction instead of two writes per match
+        self.memory.bulk_reconcile(matches)
 
     def get_market_tag(self, context):
         rsi = context.get('rsi', 50)
-        if rsi > 70: return "RSI_HIGH"
-        if rsi < 30: return "RSI_LOW"
-        return "RSI_NEUTRAL"
+        return "RSI_HIGH" if rsi > self.RSI_HIGH_THRESH else ("RSI_LOW" if rsi < self.RSI_LOW_THRESH else "RSI_NEUTRAL")
 
-    def check_evolution_schedule(self):
+    def _evolution_window(self, now):
         """
-        Checks if it's time to run Operation EVO (Sunday 02:00 UTC).
+        Returns (slot, grace): the most recent evolution_day/evolution_hour slot at or
+        before `now`, and how long after it a late wake-up still counts.
         """
-        now = datetime.now(timezone.utc)
         # 6 = Sunday. Hour = 2.
-        evo_day = CONFIG.get('evolution_day', 6)
-        evo_hour = CONFIG.get('evolution_hour', 2)
+        config = get_config()
+        evo_day = config.get('evolution_day', 6)
+        evo_hour = config.get('evolution_hour', 2)
         
-        if now.weekday() == evo_day and now.hour == evo_hour:
-            # Ensure we only run once per week (check if we ran in the last hour)
-            # Make last_evolution_check timezone aware if likely naive (assuming init was now())
-            last_check = self.last_evolution_check
-            if last_check.tzinfo is None:
-                last_check = last_check.replace(tzinfo=timezone.utc)
-                
-            if now - last_check > timedelta(hours=1):
-                logger.info("SCHEDULE TRIGGER: Running Operation EVO...")
-                self.evolver.run_evolution_cycle()
-                self.last_evolution_check = now
-
-    def run_cycle(self):
+        slot = (now - timedelta(days=(now.weekday() - evo_day) % 7)).replace(
+            hour=evo_hour, minute=0, second=0, microsecond=0)
+        if slot > now:
+            slot -= timedelta(days=7)
+
+        # A wake-up that comes late still catches the slot, as long as it is within
+        # one cycle interval (at least an hour) of it.
+        grace = timedelta(seconds=max(3600, config.get('cycle_interval', 300)))
+        return slot, grace
+
+    def _last_evolution_check_utc(self):
+        # Make last_evolution_check timezone aware if likely naive (assuming init was now())
+        last_check = self.last_evolution_check
+        if last_check.tzinfo is None:
+            last_check = last_check.replace(tzinfo=timezone.utc)
+        return last_check
+
+    def check_evolution_schedule(self):
+        """
+        Checks if it's time to run Operation EVO (Sunday 02:00 UTC).
+        """
+        now = self._now()
+        slot, grace = self._evolution_window(now)
+
+        # Ensure we only run once per slot
+        if now - slot < grace and self._last_evolution_check_utc() < slot:
+            logger.info("SCHEDULE TRIGGER: Running Operation EVO...")
+            self.evolver.run_evolution_cycle()
+            self.last_evolution_check = now
+            self.memory.set_kv("last_evolution_check", now.isoformat())
+
+    def seconds_until_evolution(self) -> float:
+        """Seconds until check_evolution_schedule would next fire; 0 if it is due now."""
+        now = self._now()
+        slot, grace = self._evolution_window(now)
+        if now - slot >= grace or self._last_evolution_check_utc() >= slot:
+            slot += timedelta(days=7)
+        return max(0.0, (slot - now).total_seconds())
+
+    async def run_cycle(self):
         logger.info("Starting strategic cycle...")
         
-        # 0. Check Evolution Schedule
-        self.check_evolution_schedule()
-        
-        # 0.5 Reconcile
+        # 0. Reconcile (Operation EVO runs on its own timer, see evolution_scheduler)
         try:
-            self.reconcile_outcomes()
+            await self.reconcile_outcomes()
         except Exception as e:
             logger.error(f"Reconciliation failed: {e}")
 
-        # 1. Fetch Technical Context via MCP
-        status = self.mcp.call_tool("fetch_bot_status")
+        config = get_config()
+        tech_weight = config.get('tech_weight', 0.6)
+        macro_weight = config.get('macro_weight', 0.4)
+        buy_threshold = config.get('buy_threshold', 0.6)
+        sell_threshold = config.get('sell_threshold', -0.6)
+
+        # Mocking technical score for MVP logic (In real app, derive from indicators)
+        # 1.0 = Buy, -1.0 = Sell
+        tech_score = 0.5 # Neutral-Bullish assumption
+
+        # If no macro score in [-1, 1] can flip the action, the macro call only
+        # matters for the risk_event breaker, so the previous cycle's answer will do.
+        # Trade-off: every other news search is skipped (half the daily Gemini budget),
+        # but a risk_event can then trip the breaker up to one cycle late.
+        low = tech_score * tech_weight - macro_weight
+        high = tech_score * tech_weight + macro_weight
+        decided = (low > buy_threshold or high < sell_threshold
+                   or (high <= buy_threshold and low >= sell_threshold))
+        macro_max_age = None
+        if decided:
+            macro_max_age = config.get('macro_ttl_decided', 1.5 * config.get('cycle_interval', 300))
+
+        # 1 & 2. Fetch Technical Context via MCP and Macro Context via Gemini Search
+        # These are independent, so overlap them instead of paying for both in sequence.
+        status, macro_data = await asyncio.gather(
+            self.mcp.call_tool("fetch_bot_status"),
+            self.gemini.analyze_macro_context(max_age=macro_max_age)
+        )
         
         # Ensure status is a dictionary
         if not isinstance(status, dict):
             logger.warning(f"fetch_bot_status returned non-dict: {status}")
             status = {"status": "unknown", "raw": str(status)}
-            
-        # Mocking technical score for MVP logic (In real app, derive from indicators)
-        # 1.0 = Buy, -1.0 = Sell
-        tech_score = 0.5 # Neutral-Bullish assumption
         
-        # 2. Fetch Macro Context via Gemini Search
-        macro_data = self.gemini.analyze_macro_context()
         macro_score = macro_data.get("sentiment_score", 0.0)
         risk_event = macro_data.get("risk_event", False)
         
         # 3. Circuit Breaker
         if risk_event:
             logger.critical(f"CIRCUIT BREAKER TRIGGERED: {macro_data.get('reasoning')}")
-            self.mcp.call_tool("stop_bot")
+            await self.mcp.call_tool("stop_bot")
             return
 
         # 4. Weighted Decision
         # 60% Technical, 40% Macro
-        tech_weight = CONFIG.get('tech_weight', 0.6)
-        macro_weight = CONFIG.get('macro_weight', 0.4)
-        
         final_score = (tech_score * tech_weight) + (macro_score * macro_weight)
         logger.info(f"Decision Scores - Tech: {tech_score}, Macro: {macro_score}, Final: {final_score}")
 
@@ -311,9 +664,6 @@ class AegisStrategist:
         action = "HOLD"
         reasoning = f"Weighted Score: {final_score}. Macro: {macro_data.get('reasoning')}"
         
-        buy_threshold = CONFIG.get('buy_threshold', 0.6)
-        sell_threshold = CONFIG.get('sell_threshold', -0.6)
-        
         if final_score > buy_threshold:
             action = "BUY_SIGNAL"
             # self.mcp.call_tool("start_bot") # Or specific buy command
@@ -327,16 +677,67 @@ class AegisStrategist:
         tag = self.get_market_tag(status)
         self.memory.store_snapshot(status, tag, action, reasoning)
 
-if __name__ == "__main__":
-    strategist = AegisStrategist()
-    
-    # Main loop
-    while True:
+async def evolution_scheduler(strategist, stop):
+    """
+    Sleeps until the next Operation EVO slot instead of polling it every cycle.
+    Sleeps are capped at one cycle interval so schedule edits in config.yaml apply.
+    A failed cycle leaves the slot due, so it is retried after error_interval, not at once.
+    Returns once `stop` is set and no cycle is running.
+    """
+    delay = None
+    while not stop.is_set():
+        if delay is None:
+            delay = min(strategist.seconds_until_evolution(), get_config().get('cycle_interval', 300))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=delay)
+            return
+        except asyncio.TimeoutError:
+            pass
+        delay = None
         try:
-            logger.info("HEARTBEAT: System is active.")
-            strategist.run_cycle()
-            # Run every 5 minutes
-            time.sleep(CONFIG.get('cycle_interval', 300))
+            # Evolution is blocking work, keep it off the loop
+            await asyncio.to_thread(strategist.check_evolution_schedule)
         except Exception as e:
-            logger.error(f"Error in main loop: {e}")
-            time.sleep(CONFIG.get('error_interval', 60))
+            logger.error(f"Evolution cycle failed: {e}")
+            delay = get_config().get('error_interval', 60)
+
+async def main_loop():
+    strategist = AegisStrategist()
+    loop = asyncio.get_running_loop()
+
+    # SIGTERM (docker stop) / SIGINT let the current cycle finish its DB writes
+    # instead of killing it mid-way, and cut the idle wait short.
+    stop = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    
+    evolution_task = asyncio.create_task(evolution_scheduler(strategist, stop))
+    
+    # Main loop. Wake-ups are scheduled on absolute time so the cadence does not
+    # drift by however long each cycle took.
+    try:
+        while not stop.is_set():
+            next_wake = loop.time() + get_config().get('cycle_interval', 300)
+            try:
+                logger.info("HEARTBEAT: System is active.")
+                await strategist.run_cycle()
+            except Exception as e:
+                logger.error(f"Error in main loop: {e}")
+                next_wake = loop.time() + get_config().get('error_interval', 60)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=max(0, next_wake - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        logger.info("Shutting down...")
+        # Cancelling the task would not stop an EVO worker thread, which still writes to the
+        # DB: let the scheduler return on its own and only close the DB once it has
+        stop.set()
+        done, _ = await asyncio.wait({evolution_task}, timeout=EVO_SHUTDOWN_TIMEOUT)
+        if not done:
+            logger.warning("Operation EVO still running; leaving the memory DB open.")
+            evolution_task.cancel()
+        await strategist.close(close_memory=bool(done))
+
+if __name__ == "__main__":
+    asyncio.run(main_loop())
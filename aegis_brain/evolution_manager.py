@@ -1,30 +1,112 @@
 import os
+import re
 import logging
 import json
-import docker
 import sqlite3
+import time
+import hashlib
 
 from google import genai # New SDK
+from google.genai import types
 from datetime import datetime, timedelta
+from memory_manager import MemoryManager
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("AEGIS_Genesis")
 
+CANDIDATE_STRATEGY_NAME = "AEGIS_Strategy_Candidate"
+
+# Role, guardrails and output contract never change between runs; only the context
+# and current code do. Kept apart so it can be served from a Gemini context cache.
+STATIC_SYSTEM_INSTRUCTION = f"""
+        You are the 'Evolver Agent' for Project AEGIS. Your mission is to evolve the trading strategy `AEGIS_Strategy`.
+
+        ### EVOLUTION DIRECTIVES
+        Refactor the code to adapt to the current Context.
+
+        ### ANTI-OVERFITTING PROTOCOLS (Guardrails)
+        Warning: You will be penalized for violating these rules.
+        1. **Penalty for Complexity (Ockham's Razor):** Do NOT add indicators unless absolutely necessary. Simpler is better. Deduct points for every extra import.
+        2. **Reward for Consistency:** Focus on logic that produces consistent wins (high Sharpe/Sortino) rather than lucky home runs.
+        3. **Noise Filtering:** Ask yourself: "Is this signal a trend or just noise?" Avoid reacting to single anomalies in the history.
+        4. **Robustness:** Ensure logic holds across multiple timeframes.
+
+        ### OUTPUT REQUIREMENTS
+        1. **Class Name:** MUST be `{CANDIDATE_STRATEGY_NAME}`.
+        2. **Inheritance:** MUST inherit from `IStrategy`.
+        3. **Imports:** Keep standard Freqtrade imports.
+        4. **Format:** Return ONLY the full valid Python code for the file. Run no explanations before or after the code block.
+        """
+
+PROMPT_CACHE_TTL = 3600 # seconds
+
+_FENCE_OPEN_RE = re.compile(r"```[\w+-]*[ \t]*\n")
+
+class _FencedCodeWriter:
+    """
+    Fed response chunks as they arrive, writes the contents of the first markdown code block
+    (with or without a language tag; an unterminated fence runs to the end) to a file, or the
+    whole text if it has no fence, without waiting for the full response.
+    """
+    def __init__(self, f):
+        self.f = f
+        self.parts = []
+        self._buf = ""
+        self._state = "pre" # pre -> body -> done
+
+    def _write(self, text: str):
+        self.f.write(text)
+        self.parts.append(text)
+
+    def feed(self, text: str):
+        if self._state == "done":
+            return
+        self._buf += text
+        if self._state == "pre":
+            match = _FENCE_OPEN_RE.search(self._buf)
+            if not match:
+                return
+            self._buf = self._buf[match.end():]
+            self._state = "body"
+        end = self._buf.find("```")
+        if end >= 0:
+            body = self._buf[:end]
+            self._write(body[:-1] if body.endswith("\n") else body)
+            self._buf = ""
+            self._state = "done"
+        elif len(self._buf) > 4:
+            # Hold back a possibly split closing fence and the newline before it
+            self._write(self._buf[:-4])
+            self._buf = self._buf[-4:]
+
+    def close(self) -> str:
+        """Flushes the remainder (no fence: the whole text) and returns what was written."""
+        if self._state != "done":
+            self._write(self._buf)
+            self._buf = ""
+            self._state = "done"
+        return "".join(self.parts)
+
 class EvolutionManager:
     """
     The 'Project Genesis' Evolution Engine.
     Manages the lifecycle of AEGIS_Strategy, evolving it based on multi-modal inputs.
     """
-    def __init__(self, api_key):
+    def __init__(self, api_key, client=None, memory=None):
         self.api_key = api_key
+        # Durable state: the hash of the last prompt that produced a candidate
+        self.memory = memory or MemoryManager()
         if api_key:
-            self.client = genai.Client(api_key=api_key)
+            self.client = client or genai.Client(api_key=api_key)
             self.model_name = 'gemini-2.5-flash'
         
         # Connect to Docker Daemon
         try:
-            self.docker_client = docker.from_env()
+            # Imported here, not at module load: only needed once a manager is constructed
+            import docker
+            # Created once per process; a small keep-alive pool serves bursts of container calls
+            self.docker_client = docker.from_env(timeout=30, max_pool_size=4)
         except Exception as e:
             logger.error(f"Failed to connect to Docker: {e}")
             self.docker_client = None
@@ -34,7 +116,33 @@ class EvolutionManager:
         self.user_data_path = "/freqtrade/user_data"
         self.db_path = f"{self.user_data_path}/tradesv3.sqlite"
         self.current_strategy_name = "AEGIS_Strategy"
-        self.candidate_strategy_name = "AEGIS_Strategy_Candidate"
+        self.candidate_strategy_name = CANDIDATE_STRATEGY_NAME
+        self._trades_conn = None
+        # (DB file versions, summary) of the last history read; reused until Freqtrade writes again
+        self._history_cache = None
+        # (mtime_ns, source) of the current strategy file; a hot-swap rewrite bumps the mtime
+        self._strategy_src_cache = None
+        # Context caches holding STATIC_SYSTEM_INSTRUCTION + current code:
+        # sha256(code block) -> (name or None, created at)
+        self._prompt_cache_map = {}
+
+    def _get_trades_conn(self):
+        """Lazily opens a read-only connection to Freqtrade's DB, reused across calls."""
+        if self._trades_conn is None:
+            self._trades_conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            self._trades_conn.execute("PRAGMA query_only=1")
+        return self._trades_conn
+
+    def _db_version(self) -> tuple:
+        """mtime/size of the trades DB and its WAL file; changes whenever a trade is written."""
+        version = []
+        for path in (self.db_path, f"{self.db_path}-wal"):
+            try:
+                st = os.stat(path)
+                version.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                version.append(None)
+        return tuple(version)
 
     def fetch_transaction_history(self) -> str:
         """
@@ -44,22 +152,23 @@ class EvolutionManager:
         if not os.path.exists(self.db_path):
             return "No trading database found."
 
+        version = self._db_version()
+        if self._history_cache and self._history_cache[0] == version:
+            return self._history_cache[1]
+
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
             # Get last 50 trades with details
-            cursor.execute("""
+            cursor = self._get_trades_conn().execute("""
                 SELECT pair, close_date, close_profit, exit_reason, strategy 
                 FROM trades 
                 ORDER BY close_date DESC 
                 LIMIT 50
             """)
-            trades = cursor.fetchall()
-            conn.close()
             
-            summary = "Recent Transaction History (Last 50 trades):\n"
-            for trade in trades:
-                summary += f"Pair: {trade[0]}, Profit: {trade[2]}, Reason: {trade[3]}\n"
+            lines = ["Recent Transaction History (Last 50 trades):"]
+            lines.extend(f"Pair: {trade[0]}, Profit: {trade[2]}, Reason: {trade[3]}" for trade in cursor)
+            summary = "\n".join(lines) + "\n"
+            self._history_cache = (version, summary)
             return summary
         except Exception as e:
             logger.error(f"DB read failed: {e}")
@@ -67,44 +176,63 @@ class EvolutionManager:
 
     def construct_evolution_prompt(self, current_code: str, history: str) -> str:
         """
-        Constructs the System Prompt for the Evolver Agent (Gemini).
-        Enforces Input Data Fusion and Anti-Overfitting Protocols.
+        Constructs the per-run user content for the Evolver Agent (Gemini).
+        The role, Anti-Overfitting Protocols and output rules live in STATIC_SYSTEM_INSTRUCTION.
+        The code block comes first: together with the instruction it is the cacheable prefix.
+        """
+        return self._code_block(current_code) + self._context_block(history)
+
+    def _code_block(self, current_code: str) -> str:
+        """The current strategy source; only changes when a strategy is hot-swapped."""
+        return f"""
+        ### CURRENT STRATEGY CODE
+        ```python
+        {current_code}
+        ```
         """
+
+    def _context_block(self, history: str) -> str:
+        """The per-run inputs."""
         # Mocking external inputs for MVP (In a real system, these would come from APIs)
         macro_context = "Market Condition: High Volatility, Interest Rates Stable."
         social_sentiment = "Social Sentiment: Neutral/Fearful."
         
-        prompt = f"""
-        You are the 'Evolver Agent' for Project AEGIS. Your mission is to evolve the trading strategy `AEGIS_Strategy`.
-
+        return f"""
         ### CONTEXT (Input Data Fusion)
         1. **Macro Context:** {macro_context}
         2. **Social Sentiment:** {social_sentiment}
         3. **Transaction History:** 
            {history}
-        
-        ### CURRENT STRATEGY CODE
-        ```python
-        {current_code}
-        ```
-
-        ### EVOLUTION DIRECTIVES
-        Refactor the code to adapt to the current Context.
-
-        ### ANTI-OVERFITTING PROTOCOLS (Guardrails)
-        Warning: You will be penalized for violating these rules.
-        1. **Penalty for Complexity (Ockham's Razor):** Do NOT add indicators unless absolutely necessary. Simpler is better. Deduct points for every extra import.
-        2. **Reward for Consistency:** Focus on logic that produces consistent wins (high Sharpe/Sortino) rather than lucky home runs.
-        3. **Noise Filtering:** Ask yourself: "Is this signal a trend or just noise?" Avoid reacting to single anomalies in the history.
-        4. **Robustness:** Ensure logic holds across multiple timeframes.
+        """
 
-        ### OUTPUT REQUIREMENTS
-        1. **Class Name:** MUST be `{self.candidate_strategy_name}`.
-        2. **Inheritance:** MUST inherit from `IStrategy`.
-        3. **Imports:** Keep standard Freqtrade imports.
-        4. **Format:** Return ONLY the full valid Python code for the file. Run no explanations before or after the code block.
+    def _get_prompt_cache(self, code_block: str):
+        """
+        Returns the name of a context cache holding STATIC_SYSTEM_INSTRUCTION and the
+        current strategy code, creating it when the code changed or the cache expired.
+        None if caching is unavailable (e.g. below the model's minimum cacheable size);
+        everything is then sent inline.
         """
-        return prompt
+        key = hashlib.sha256(code_block.encode()).hexdigest()
+        name, created = self._prompt_cache_map.get(key, (None, None))
+        if created is not None and time.monotonic() - created < PROMPT_CACHE_TTL - 60:
+            return name
+        try:
+            cache = self.client.caches.create(
+                model=self.model_name,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"aegis_evolver_{key[:16]}",
+                    system_instruction=STATIC_SYSTEM_INSTRUCTION,
+                    contents=[types.Content(role="user", parts=[types.Part.from_text(text=code_block)])],
+                    ttl=f"{PROMPT_CACHE_TTL}s"
+                )
+            )
+            name = cache.name
+        except Exception as e:
+            logger.info(f"Context caching unavailable, sending prompt inline: {e}")
+            name = None
+        # A hot-swapped strategy makes older entries unreachable; let them expire server-side
+        self._prompt_cache_map = {key: (name, time.monotonic())}
+        return name
 
     def evolve_strategy(self):
         """
@@ -131,12 +259,18 @@ class EvolutionManager:
         local_base_path = "/freqtrade/user_data"
         real_strategy_path = os.path.join(local_base_path, "strategies", f"{self.current_strategy_name}.py")
         
-        if not os.path.exists(real_strategy_path):
+        try:
+            mtime = os.stat(real_strategy_path).st_mtime_ns
+        except FileNotFoundError:
             logger.error(f"Critical: Current strategy file not found at {real_strategy_path}")
             return
 
-        with open(real_strategy_path, "r") as f:
-            current_code = f.read()
+        if self._strategy_src_cache and self._strategy_src_cache[0] == mtime:
+            current_code = self._strategy_src_cache[1]
+        else:
+            with open(real_strategy_path, "r") as f:
+                current_code = f.read()
+            self._strategy_src_cache = (mtime, current_code)
 
         # 2. Prepare Data
         history_summary = self.fetch_transaction_history() # valid if db exists locally
@@ -146,28 +280,50 @@ class EvolutionManager:
              return
 
         # 3. Prompt
-        prompt = self.construct_evolution_prompt(current_code, history_summary)
+        code_block = self._code_block(current_code)
+        context_block = self._context_block(history_summary)
+        prompt = code_block + context_block
+
+        # Same strategy, same trade history, same instructions: the previous candidate stands
+        key = hashlib.sha256((STATIC_SYSTEM_INSTRUCTION + prompt).encode()).hexdigest()
+        if self.memory.get_kv("last_evolution_prompt") == key:
+            logger.info(f"No-op: inputs unchanged since last evolution ({key[:12]}). Skipping Gemini call.")
+            return
         
         # 4. Write
         try:
             logger.info("Sending prompt to Gemini...")
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt
-            )
-            candidate_code = response.text
-            
-            # Sanitization
-            if "```python" in candidate_code:
-                candidate_code = candidate_code.split("```python")[1].split("```")[0]
-            elif "```" in candidate_code:
-                candidate_code = candidate_code.split("```")[1].split("```")[0]
-                
             candidate_file_path = os.path.join(local_base_path, "strategies", f"{self.candidate_strategy_name}.py")
-            with open(candidate_file_path, "w") as f:
-                f.write(candidate_code)
+            cache_name = self._get_prompt_cache(code_block)
+            if cache_name:
+                # Instruction and code are served from the cache; only the context is sent
+                config = types.GenerateContentConfig(cached_content=cache_name)
+                contents = context_block
+            else:
+                config = types.GenerateContentConfig(system_instruction=STATIC_SYSTEM_INSTRUCTION)
+                contents = prompt
+
+            # Stream: the code block goes to disk as it arrives, sanitized on the fly.
+            # Written to a temp file and swapped in, so a half-written candidate is never visible.
+            tmp_path = f"{candidate_file_path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    writer = _FencedCodeWriter(f)
+                    for chunk in self.client.models.generate_content_stream(
+                        model=self.model_name,
+                        contents=contents,
+                        config=config
+                    ):
+                        if chunk.text:
+                            writer.feed(chunk.text)
+                    writer.close()
+                os.replace(tmp_path, candidate_file_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
             
             logger.info(f"Evolution complete. Candidate written to: {candidate_file_path}")
+            self.memory.set_kv("last_evolution_prompt", key)
             
         except Exception as e:
             logger.error(f"Evolution failed during generation: {e}")
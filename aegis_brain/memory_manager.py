@@ -1,10 +1,20 @@
 import sqlite3
 import json
 import logging
+import functools
+import threading
 from datetime import datetime, timedelta
 
 logger = logging.getLogger("AEGIS_Memory")
 
+def _synchronized(method):
+    """Serializes access to the shared connection (the evolver runs in a worker thread)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class MemoryManager:
     """
     Manages the SQLite database for Project AEGIS.
@@ -13,12 +23,27 @@ class MemoryManager:
     """
     def __init__(self, db_path="memory.db"):
         self.db_path = db_path
+        # One connection for the process lifetime. Autocommit mode: single statements
+        # commit on their own, multi-statement writes use an explicit BEGIN.
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA cache_size=-20000")
+        self._lock = threading.RLock()
+        # (MAX(id), limit, text) of the last rendered evolution history
+        self._history_context_cache = None
         self._init_db()
 
+    @_synchronized
+    def close(self):
+        """Closes the database connection."""
+        self.conn.close()
+
     def _init_db(self):
         """Initializes the database schema."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
         # Table A: market_snapshots (The Prediction)
         cursor.execute('''
@@ -30,9 +55,21 @@ class MemoryManager:
                 ai_decision TEXT,
                 ai_reasoning TEXT,
                 outcome_score REAL DEFAULT 0.0,
-                is_reconciled BOOLEAN DEFAULT 0
+                is_reconciled BOOLEAN DEFAULT 0,
+                snap_ts REAL
             )
         ''')
+        self._migrate_snap_ts(cursor)
+        # Reconciliation probes unreconciled rows by time window
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_snap_unrec_ts
+            ON market_snapshots (is_reconciled, snap_ts)
+        ''')
+        # RAG lookup by tag, newest first
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_snap_tag_recon_id
+            ON market_snapshots (market_tag, is_reconciled, id DESC)
+        ''')
 
         # Table B: trade_history (The Reality)
         cursor.execute('''
@@ -46,6 +83,10 @@ class MemoryManager:
                 FOREIGN KEY(snapshot_id) REFERENCES market_snapshots(id)
             )
         ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_trade_open_ts
+            ON trade_history (open_timestamp)
+        ''')
         
         # Table C: strategy_evolution (The Labs)
         cursor.execute('''
@@ -59,55 +100,95 @@ class MemoryManager:
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        # Table D: kv (Durable runtime state, e.g. scheduler bookkeeping)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS kv (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
 
+        # The semantic LLM response cache is gone; drop its table from older databases
+        cursor.execute("DROP TABLE IF EXISTS llm_cache")
+
+    def _migrate_snap_ts(self, cursor):
+        """Adds and backfills the epoch-seconds column on databases created before it existed."""
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(market_snapshots)")]
+        if 'snap_ts' in columns:
+            return
+        cursor.execute("ALTER TABLE market_snapshots ADD COLUMN snap_ts REAL")
+        rows = cursor.execute("SELECT id, timestamp FROM market_snapshots").fetchall()
+        cursor.executemany(
+            "UPDATE market_snapshots SET snap_ts = ? WHERE id = ?",
+            [(datetime.fromisoformat(ts).timestamp(), snap_id) for snap_id, ts in rows if ts]
+        )
+        logger.info(f"Backfilled snap_ts for {len(rows)} snapshots")
+
+    @_synchronized
     def store_snapshot(self, metrics: dict, tag: str, decision: str, reasoning: str) -> int:
         """Stores a new market snapshot before action is taken."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
+        now = datetime.now()
         cursor.execute(
             '''INSERT INTO market_snapshots 
-               (timestamp, market_metrics, market_tag, ai_decision, ai_reasoning) 
-               VALUES (?, ?, ?, ?, ?)''',
-            (datetime.now().isoformat(), json.dumps(metrics), tag, decision, reasoning)
+               (timestamp, market_metrics, market_tag, ai_decision, ai_reasoning, snap_ts) 
+               VALUES (?, ?, ?, ?, ?, ?)''',
+            (now.isoformat(), json.dumps(metrics), tag, decision, reasoning, now.timestamp())
         )
         snapshot_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
         logger.info(f"Snapshot stored with ID: {snapshot_id}")
         return snapshot_id
 
-    def get_unreconciled_snapshots(self, hours_back=24):
-        """Fetches snapshots that haven't been linked to a trade outcome yet."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    @_synchronized
+    def get_unreconciled_snapshots(self, hours_back=24, since: float = None):
+        """
+        Fetches snapshots that haven't been linked to a trade outcome yet.
+        Rows are sqlite3.Row (id, timestamp, snap_ts), snap_ts being epoch seconds.
+
+        Args:
+            hours_back: Hard lookback limit.
+            since: Optional epoch-seconds lower bound; the later of the two applies.
+        """
+        cursor = self.conn.cursor()
         # Look back X hours to avoid processing ancient history
-        cutoff = (datetime.now() - timedelta(hours=hours_back)).isoformat()
+        cutoff = (datetime.now() - timedelta(hours=hours_back)).timestamp()
+        if since is not None:
+            cutoff = max(cutoff, since)
         cursor.execute(
-            "SELECT * FROM market_snapshots WHERE is_reconciled = 0 AND timestamp > ?", 
+            '''SELECT id, timestamp, snap_ts FROM market_snapshots 
+               WHERE is_reconciled = 0 AND snap_ts >= ? 
+               ORDER BY snap_ts''', 
             (cutoff,)
         )
         rows = cursor.fetchall()
-        conn.close()
         return rows
 
+    @_synchronized
+    def has_unreconciled_snapshots(self, hours_back=24) -> bool:
+        """Cheap index probe: is there anything for reconciliation to do?"""
+        cursor = self.conn.cursor()
+        cutoff = (datetime.now() - timedelta(hours=hours_back)).timestamp()
+        cursor.execute(
+            "SELECT 1 FROM market_snapshots WHERE is_reconciled = 0 AND snap_ts >= ? LIMIT 1",
+            (cutoff,)
+        )
+        row = cursor.fetchone()
+        return row is not None
+
+    @_synchronized
     def update_snapshot_outcome(self, snapshot_id: int, score: float):
         """Updates the outcome score of a snapshot after reconciliation."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         cursor.execute(
             "UPDATE market_snapshots SET outcome_score = ?, is_reconciled = 1 WHERE id = ?",
             (score, snapshot_id)
         )
-        conn.commit()
-        conn.close()
         logger.info(f"Snapshot {snapshot_id} reconciled with score {score}")
 
+    @_synchronized
     def store_trade(self, trade_data: dict, snapshot_id: int = None):
         """Stores a closed trade record."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         try:
             cursor.execute(
                 '''INSERT OR IGNORE INTO trade_history 
@@ -122,19 +203,61 @@ class MemoryManager:
                     snapshot_id
                 )
             )
-            conn.commit()
         except Exception as e:
             logger.error(f"Error storing trade: {e}")
-        finally:
-            conn.close()
 
+    @_synchronized
+    def bulk_reconcile(self, matches: list):
+        """
+        Applies a whole reconciliation pass in a single transaction.
+
+        Args:
+            matches: List of (snapshot_id, score, trade_data) tuples.
+        """
+        if not matches:
+            return
+
+        outcomes = [(score, snapshot_id) for snapshot_id, score, _ in matches]
+        trade_rows = []
+        for snapshot_id, _, trade_data in matches:
+            try:
+                trade_rows.append((
+                    trade_data['trade_id'],
+                    trade_data['pair'],
+                    trade_data['open_date'], # Assuming standard Freqtrade format
+                    trade_data['close_date'],
+                    trade_data['profit_ratio'],
+                    snapshot_id
+                ))
+            except KeyError as e:
+                logger.error(f"Error storing trade: missing field {e}")
+
+        cursor = self.conn.cursor()
+        cursor.execute("BEGIN")
+        try:
+            cursor.executemany(
+                "UPDATE market_snapshots SET outcome_score = ?, is_reconciled = 1 WHERE id = ?",
+                outcomes
+            )
+            cursor.executemany(
+                '''INSERT OR IGNORE INTO trade_history 
+                   (trade_id, pair, open_timestamp, close_timestamp, profit_pct, snapshot_id) 
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                trade_rows
+            )
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        logger.info(f"Reconciled {len(outcomes)} snapshots, stored {len(trade_rows)} trades")
+
+    @_synchronized
     def get_similar_snapshots(self, tag: str, limit=3):
         """
         RAG: Retrieves past reconciled snapshots with the same market tag.
         Used to inject context into the LLM prompt.
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         cursor.execute(
             '''SELECT ai_decision, outcome_score, ai_reasoning 
                FROM market_snapshots 
@@ -143,27 +266,24 @@ class MemoryManager:
             (tag, limit)
         )
         rows = cursor.fetchall()
-        conn.close()
         return rows
 
+    @_synchronized
     def store_evolution_attempt(self, strategy_name: str, metrics: dict, passed: bool, reason: str):
         """Stores the result of a strategy evolution cycle."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         cursor.execute(
             '''INSERT INTO strategy_evolution 
                (timestamp, strategy_name, metrics_json, passed_validation, rejection_reason) 
                VALUES (?, ?, ?, ?, ?)''',
             (datetime.now().isoformat(), strategy_name, json.dumps(metrics), passed, reason)
         )
-        conn.commit()
-        conn.close()
         logger.info(f"Evolution attempt stored: {strategy_name} Passed={passed}")
 
+    @_synchronized
     def get_evolution_history(self, limit=5):
         """Fetches recent evolution attempts to inform the LLM."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         cursor.execute(
             '''SELECT strategy_name, metrics_json, passed_validation, rejection_reason 
                FROM strategy_evolution 
@@ -171,5 +291,34 @@ class MemoryManager:
             (limit,)
         )
         rows = cursor.fetchall()
-        conn.close()
         return rows
+
+    @_synchronized
+    def get_history_context(self, limit=3) -> str:
+        """
+        The last `limit` evolution attempts rendered for a prompt, one per line.
+        Rebuilt only after a new attempt is stored, so the text stays byte-identical in between.
+        """
+        latest = self.conn.execute("SELECT MAX(id) FROM strategy_evolution").fetchone()[0]
+        if self._history_context_cache and self._history_context_cache[:2] == (latest, limit):
+            return self._history_context_cache[2]
+        text = "\n".join(str(tuple(row)) for row in self.get_evolution_history(limit=limit))
+        self._history_context_cache = (latest, limit, text)
+        return text
+
+    @_synchronized
+    def get_kv(self, key: str, default=None):
+        """Reads a value from the key/value state table."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT value FROM kv WHERE key = ?", (key,))
+        row = cursor.fetchone()
+        return row[0] if row else default
+
+    @_synchronized
+    def set_kv(self, key: str, value: str):
+        """Upserts a value in the key/value state table."""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "INSERT INTO kv (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
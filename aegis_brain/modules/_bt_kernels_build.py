@@ -0,0 +1,21 @@
+"""
+Ahead-of-time build of the backtest kernels into a native extension module (_bt_kernels).
+_bt_loop picks it up automatically; without it the kernels are JIT-compiled at startup.
+
+Usage (from aegis_brain/, needs a C compiler):
+    python -m modules._bt_kernels_build
+"""
+import os
+from numba.pycc import CC
+
+from ._bt_loop import _simulate_trades, _simulate_batch
+
+cc = CC('_bt_kernels')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+cc.export('simulate_trades', 'Tuple((f8[:], f8[:]))(i1[:], i1[:], f4[:], i8)')(_simulate_trades.py_func)
+# pycc has no parallel backend: this is the serial variant, used only when numba is absent at runtime
+cc.export('simulate_batch', 'f8[:, :](i1[:, :], i1[:, :], f4[:])')(_simulate_batch.py_func)
+
+if __name__ == "__main__":
+    cc.compile()
@@ -0,0 +1,148 @@
+"""
+Compiled inner loops for the VectorizedBacktester.
+Uses the ahead-of-time build (_bt_kernels, see _bt_kernels_build.py) when present,
+numba JIT otherwise, and falls back to plain Python when numba is not installed
+(same results, slower).
+"""
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+# Early abort: by this fraction of the rows an individual must have entered a trade
+# and kept equity above this ratio of the start, or it is written off as a penalty
+ABORT_CHECK_FRACTION = 0.2
+ABORT_MIN_EQUITY_RATIO = 0.5
+
+
+@njit(cache=True, nogil=True)
+def _simulate_trades(enter, exit_, close, abort_at=0):
+    """
+    Walks the signal columns once, long-only, one position at a time.
+    An entry/exit fires on the rising edge of its signal (1 now, not 1 on the previous row).
+
+    Args:
+        enter: int8 array, 1 where enter_long is set.
+        exit_: int8 array, 1 where exit_long is set.
+        close: float32 array of close prices (profits and equity accumulate in float64).
+        abort_at: Row at which to give up on an individual with no entries yet or equity
+            below ABORT_MIN_EQUITY_RATIO. 0 disables the check.
+
+    Returns:
+        (profits, equity): per-trade profit ratios, and the equity curve
+        starting at 100.0 with one point per closed trade. Both are empty if aborted.
+    """
+    n = close.shape[0]
+    profits = np.empty(n, np.float64)
+    equity = np.empty(n + 1, np.float64)
+    equity[0] = 100.0
+    n_trades = 0
+
+    in_trade = False
+    entry_price = 0.0
+    n_entries = 0
+    min_equity = 100.0
+    prev_enter = 0
+    prev_exit = 0
+    for i in range(n):
+        if i == abort_at and i > 0:
+            if n_entries == 0 or min_equity < 100.0 * ABORT_MIN_EQUITY_RATIO:
+                return profits[:0], equity[:0]
+
+        trade_entry = enter[i] == 1 and prev_enter != 1
+        trade_exit = exit_[i] == 1 and prev_exit != 1
+        prev_enter = enter[i]
+        prev_exit = exit_[i]
+
+        if not in_trade and trade_entry:
+            in_trade = True
+            entry_price = np.float64(close[i])
+            n_entries += 1
+        elif in_trade and trade_exit:
+            in_trade = False
+            profit = (close[i] - entry_price) / entry_price
+            profits[n_trades] = profit
+            equity[n_trades + 1] = equity[n_trades] * (1.0 + profit)
+            n_trades += 1
+            if equity[n_trades] < min_equity:
+                min_equity = equity[n_trades]
+
+    return profits[:n_trades], equity[:n_trades + 1]
+
+
+@njit(cache=True, parallel=True)
+def _simulate_batch(enter, exit_, close):
+    """
+    Runs _simulate_trades for a whole population at once, one individual per prange lane.
+
+    Args:
+        enter: (n_pop, n) int8 matrix, row p holds individual p's enter_long.
+        exit_: (n_pop, n) int8 matrix of exit_long.
+        close: float32 array of close prices, shared by every individual.
+
+    Returns:
+        (n_pop, 3) float64 matrix of [profit_ratio, max_drawdown, total_trades] per individual.
+        Individuals aborted early get [-1.0, 1.0, 0], the same as a run without trades.
+    """
+    n_pop = enter.shape[0]
+    abort_at = int(close.shape[0] * ABORT_CHECK_FRACTION)
+    stats = np.empty((n_pop, 3), np.float64)
+    for p in prange(n_pop):
+        profits, equity = _simulate_trades(enter[p], exit_[p], close, abort_at)
+        if equity.shape[0] == 0:
+            stats[p, 0] = -1.0
+            stats[p, 1] = 1.0
+            stats[p, 2] = 0.0
+            continue
+
+        peak = equity[0]
+        max_drawdown = 0.0
+        for value in equity:
+            if value > peak:
+                peak = value
+            drawdown = (peak - value) / peak
+            if drawdown > max_drawdown:
+                max_drawdown = drawdown
+
+        stats[p, 0] = equity[-1] / 100.0 - 1.0
+        stats[p, 1] = max_drawdown
+        stats[p, 2] = profits.shape[0]
+    return stats
+
+
+# Ahead-of-time build: native code with no JIT compile in a fresh process
+try:
+    from . import _bt_kernels
+except ImportError:
+    _bt_kernels = None
+
+if _bt_kernels is not None:
+    def simulate_trades(enter, exit_, close, abort_at=0):
+        return _bt_kernels.simulate_trades(enter, exit_, close, abort_at)
+else:
+    simulate_trades = _simulate_trades
+
+# The AOT batch kernel is serial; the parallel JIT one wins whenever numba is importable
+if _bt_kernels is not None and not HAVE_NUMBA:
+    simulate_batch = _bt_kernels.simulate_batch
+else:
+    simulate_batch = _simulate_batch
+
+
+def warmup():
+    """Compiles (or loads from cache) the JIT kernels in use, with the dtypes the backtester uses."""
+    signals = np.zeros(2, np.int8)
+    if simulate_trades is _simulate_trades:
+        _simulate_trades(signals, signals, np.ones(2, np.float32))
+    if simulate_batch is _simulate_batch:
+        _simulate_batch(signals.reshape(1, 2), signals.reshape(1, 2), np.ones(2, np.float32))
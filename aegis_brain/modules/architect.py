@@ -2,102 +2,214 @@
 import logging
 import json
 import re
+import asyncio
 from google import genai
 from google.genai import types
 
 # Configure logging
 logger = logging.getLogger("AEGIS_Architect")
 
+# Alternative templates requested per evolution cycle; each is optimized in its own process
+TEMPLATE_VARIANTS = 3
+
+# Structured output: genes come back as a list because the schema can't express a free-keyed map
+TEMPLATE_SCHEMA = types.Schema(
+    type=types.Type.OBJECT,
+    properties={
+        "template_code": types.Schema(type=types.Type.STRING),
+        "parameter_definitions": types.Schema(
+            type=types.Type.ARRAY,
+            items=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    "name": types.Schema(type=types.Type.STRING),
+                    "type": types.Schema(type=types.Type.STRING, enum=["int", "float"]),
+                    "low": types.Schema(type=types.Type.NUMBER),
+                    "high": types.Schema(type=types.Type.NUMBER),
+                    "affects_indicators": types.Schema(type=types.Type.BOOLEAN),
+                },
+                required=["name", "type", "low", "high", "affects_indicators"],
+            ),
+        ),
+    },
+    required=["template_code", "parameter_definitions"],
+)
+
+# Static part of the Architect prompt. Plain string (no interpolation) so it is byte-identical on every call.
+ARCHITECT_INSTRUCTIONS = """
+        You are the ARCHITECT of the AEGIS Trading System.
+        Your goal is to design a high-level trading strategy based on the market context given at the end.
+        
+        CRITICAL INSTRUCTION:
+        Do NOT write hardcoded numbers for indicators (e.g. RSI < 30).
+        Instead, read every tunable value from the parameter dict `self.p`, e.g. `self.p['variable_name']`.
+        Do NOT define `self.p` yourself; it is injected before the strategy runs.
+        
+        We will use a Genetic Algorithm to find the optimal numbers later.
+        
+        Output a JSON object with two keys:
+        1. "template_code": The Python code for the `IStrategy` class. 
+           - Class name MUST be `AEGIS_Strategy_Template`.
+           - Inherit from `IStrategy`.
+           - Inside `populate_indicators`, `populate_entry_trend`, `populate_exit_trend`, use your variables.
+           - Example: `dataframe['rsi'] < self.p['buy_rsi']`
+           - Prefer NOT reading `self.p` in `populate_indicators`: it then runs once and is shared by every
+             candidate. Put threshold genes in `populate_entry_trend` / `populate_exit_trend`, which should
+             only add the `enter_long` / `exit_long` columns and never modify indicator columns in place.
+        
+        2. "parameter_definitions": A list defining the variables, one object per gene with
+           "name" (the `self.p` key), "type" (int/float), "low", "high", and "affects_indicators" (bool):
+           true only for genes read in `populate_indicators` (e.g. an indicator period).
+           - Example: `[{"name": "buy_rsi", "type": "int", "low": 10, "high": 40, "affects_indicators": false}]`
+           
+        Valid Gene Types: "int", "float".
+        
+        The code must be valid Python.
+        """
+
 class Architect:
     """
     The Architect (Qualitative Designer).
     Uses Gemini to analyze market context and generate Strategy Templates.
-    These templates contain placeholders (GENES) for the Engineer to optimize.
+    These templates read their tunable values (GENES) from `self.p` for the Engineer to optimize.
     """
-    def __init__(self, api_key):
+    def __init__(self, api_key, client=None):
         self.api_key = api_key
         if api_key:
-            self.client = genai.Client(api_key=api_key)
+            # Reuse the caller's genai.Client when given, so the process keeps one HTTP pool
+            self.client = client or genai.Client(api_key=api_key)
             self.model_name = "gemini-2.5-flash"
         else:
             logger.warning("Architect initialized without API Key. Mock mode.")
 
     def generate_strategy_template(self, market_context: dict, evolution_history: list = None) -> tuple[str, dict]:
+        """Blocking wrapper around agenerate_strategy_template (the evolver runs in a worker thread)."""
+        return asyncio.run(self.agenerate_strategy_template(market_context, evolution_history))
+
+    async def agenerate_strategy_template(self, market_context: dict, evolution_history: list = None) -> tuple[str, dict]:
         """
-        Generates a Python strategy template with placeholders for optimization.
+        Generates a Python strategy template with genes for optimization.
         
         Args:
             market_context: Dict containing current market analysis (trend, volatility, etc).
-            evolution_history: List of past attempts to learn from.
+            evolution_history: Past attempts to learn from, as rows or pre-rendered text.
             
         Returns:
-            template_code (str): Python code with {placeholders}.
+            template_code (str): Python code reading genes from self.p['name'].
             parameter_definitions (dict): Dictionary defining genes and their ranges.
         """
         logger.info("Architect: Designing new strategy template...")
         
         # 1. Construct Prompt
-        context_str = json.dumps(market_context, indent=2)
-        history_str = ""
-        if evolution_history:
-            history_str = "\nPAST EVOLUTION ATTEMPTS (LEARN FROM THESE):\n" + "\n".join([str(h) for h in evolution_history])
+        prompt = self._build_prompt(market_context, evolution_history)
 
-        prompt = f"""
-        You are the ARCHITECT of the AEGIS Trading System.
-        Your goal is to design a high-level trading strategy based on the current market context.
-        
-        MARKET CONTEXT:
-        {context_str}
-        
-        {history_str}
-        
-        CRITICAL INSTRUCTION:
-        Do NOT write hardcoded numbers for indicators (e.g. RSI < 30).
-        Instead, use PLACEHOLDERS in the format `{{variable_name}}`.
-        
-        We will use a Genetic Algorithm to find the optimal numbers later.
-        
-        Output a JSON object with two keys:
-        1. "template_code": The Python code for the `IStrategy` class. 
-           - Class name MUST be `AEGIS_Strategy_Template`.
-           - Inherit from `IStrategy`.
-           - Inside `populate_indicators`, `populate_entry_trend`, `populate_exit_trend`, use your variables.
-           - Example: `dataframe['rsi'] < {{buy_rsi}}`
-        
-        2. "parameter_definitions": A dictionary defining the variables.
-           - Key: variable name (e.g., "buy_rsi")
-           - Value: A dictionary with "type" (int/float), "low", "high".
-           - Example: `{{"buy_rsi": {{"type": "int", "low": 10, "high": 40}}}}`
-           
-        Valid Gene Types: "int", "float".
-        
-        The code must be valid Python (except for the placeholders).
-        """
-        
         if not hasattr(self, 'client'):
             logger.error("Architect cannot generate: No API Key.")
             return None, None
 
         try:
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json")
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_schema=TEMPLATE_SCHEMA
+                )
             )
             
-            # Parse Response
-            data = json.loads(response.text)
-            template_code = data.get("template_code", "")
-            parameter_definitions = data.get("parameter_definitions", {})
-            
-            # Basic Validation
-            if "AEGIS_Strategy_Template" not in template_code:
-                logger.warning("Architect generated code without correct class name. Forcing fix.")
-                template_code = re.sub(r"class \w+\(IStrategy\):", "class AEGIS_Strategy_Template(IStrategy):", template_code)
-                
+            template_code, parameter_definitions = self._parse_design(response.text)
             logger.info(f"Architect produced template with {len(parameter_definitions)} genes.")
             return template_code, parameter_definitions
 
         except Exception as e:
             logger.error(f"Architect generation failed: {e}")
             return None, None
+
+    def generate_strategy_variants(self, market_context: dict, evolution_history: list = None,
+                                   n_variants: int = TEMPLATE_VARIANTS) -> list:
+        """Blocking wrapper around agenerate_strategy_variants."""
+        return asyncio.run(self.agenerate_strategy_variants(market_context, evolution_history, n_variants))
+
+    async def agenerate_strategy_variants(self, market_context: dict, evolution_history: list = None,
+                                          n_variants: int = TEMPLATE_VARIANTS) -> list:
+        """
+        Generates up to n_variants alternative templates for the same context in one Gemini
+        call (one response candidate each). A single variant goes through the path above.
+        
+        Returns:
+            List of (template_code, parameter_definitions); unusable candidates are dropped.
+        """
+        if n_variants <= 1:
+            template_code, parameter_definitions = await self.agenerate_strategy_template(market_context, evolution_history)
+            return [(template_code, parameter_definitions)] if template_code and parameter_definitions else []
+
+        logger.info(f"Architect: Designing {n_variants} strategy template variants...")
+        prompt = self._build_prompt(market_context, evolution_history)
+
+        if not hasattr(self, 'client'):
+            logger.error("Architect cannot generate: No API Key.")
+            return []
+
+        try:
+            response = await self.client.aio.models.generate_content(
+                model=self.model_name,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_schema=TEMPLATE_SCHEMA,
+                    candidate_count=n_variants
+                )
+            )
+            texts = ["".join(part.text or "" for part in candidate.content.parts)
+                     for candidate in response.candidates or []]
+        except Exception as e:
+            logger.error(f"Architect generation failed: {e}")
+            return []
+
+        variants = []
+        for text in texts:
+            try:
+                template_code, parameter_definitions = self._parse_design(text)
+            except Exception as e:
+                logger.warning(f"Architect: Discarding unparsable variant: {e}")
+                continue
+            if template_code and parameter_definitions:
+                variants.append((template_code, parameter_definitions))
+
+        logger.info(f"Architect produced {len(variants)} usable template variants.")
+        return variants
+
+    def _build_prompt(self, market_context: dict, evolution_history: list = None) -> str:
+        """Renders the Architect prompt for a market context and evolution history."""
+        context_str = json.dumps(market_context, indent=2, sort_keys=True)
+        history_str = ""
+        if evolution_history:
+            # Pre-rendered text (MemoryManager.get_history_context) or raw rows
+            if not isinstance(evolution_history, str):
+                evolution_history = "\n".join([str(tuple(h)) for h in evolution_history])
+            history_str = "\nPAST EVOLUTION ATTEMPTS (LEARN FROM THESE):\n" + evolution_history
+
+        # Invariant instructions first, per-run context last: the shared prefix is what
+        # Gemini's implicit prompt caching can reuse between calls
+        prompt = ARCHITECT_INSTRUCTIONS + f"""
+        MARKET CONTEXT:
+        {context_str}
+        
+        {history_str}
+        """
+        return prompt
+
+    def _parse_design(self, response_text: str) -> tuple[str, dict]:
+        """Parses a TEMPLATE_SCHEMA response into (template_code, parameter_definitions)."""
+        data = json.loads(response_text)
+        template_code = data.get("template_code", "")
+        parameter_definitions = {}
+        for gene in data.get("parameter_definitions", []):
+            gene = dict(gene)
+            parameter_definitions[gene.pop("name")] = gene
+        
+        # Basic Validation
+        if "AEGIS_Strategy_Template" not in template_code:
+            logger.warning("Architect generated code without correct class name. Forcing fix.")
+            template_code = re.sub(r"class \w+\(IStrategy\):", "class AEGIS_Strategy_Template(IStrategy):", template_code)
+        return template_code, parameter_definitions
@@ -1,14 +1,92 @@
 
 import os
-import json
+import re
+import orjson
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
 import pandas as pd
 import pandas_ta as ta
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from ._bt_loop import simulate_trades
 
 # Configure logging
 logger = logging.getLogger("AEGIS_Backtester")
 
+# Templates that read their genes from self.p compile once; {placeholder} templates are legacy
+_PARAM_DICT_RE = re.compile(r"\bself\.p\[")
+PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+OHLCV_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume']
+
+# Indicator frames kept per (template, structural genes); each is a full copy of the data
+INDICATOR_CACHE_SIZE = 64
+
+# pandas >= 3 is always copy-on-write: a shallow copy of a shared indicator frame can't be
+# written through. On pandas 2 an in-place write (df.loc[...] = ...) would reach the shared arrays.
+_COPY_ON_WRITE = int(pd.__version__.split(".")[0]) >= 3
+
+def _format_gene(value) -> str:
+    """Source literal for a gene value: strings quoted, numbers as-is."""
+    return repr(value) if isinstance(value, str) else str(value)
+
+def fill_placeholders(template: str, parameters: dict) -> str:
+    """Substitutes every {gene} in one pass; unknown placeholders are left untouched."""
+    return PLACEHOLDER_RE.sub(
+        lambda m: _format_gene(parameters[m.group(1)]) if m.group(1) in parameters else m.group(0),
+        template
+    )
+
+class _GeneReads(dict):
+    """
+    Gene dict for a populate_indicators probe. Records every read of a gene it does not hold,
+    whether via self.p[...], .get(), `in` or iteration, so defaults can't hide a dependency.
+    """
+    def __init__(self, genes=None):
+        super().__init__(genes or {})
+        self.missed = set()
+
+    def _read(self, key):
+        if not dict.__contains__(self, key):
+            self.missed.add(key)
+
+    def __getitem__(self, key):
+        self._read(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self._read(key)
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        self._read(key)
+        return super().__contains__(key)
+
+    def setdefault(self, key, default=None):
+        self._read(key)
+        return super().setdefault(key, default)
+
+    def __iter__(self):
+        self.missed.add('*') # every gene
+        return super().__iter__()
+
+    def keys(self):
+        self.missed.add('*')
+        return super().keys()
+
+    def values(self):
+        self.missed.add('*')
+        return super().values()
+
+    def items(self):
+        self.missed.add('*')
+        return super().items()
+
 class VectorizedBacktester:
     """
     Lightweight, fast backtester using Pandas vectorization.
@@ -17,13 +95,19 @@ class VectorizedBacktester:
     def __init__(self, data_dir="/freqtrade/user_data/data/binance"):
         self.data_dir = data_dir
         self.data_cache = {} # Cache loaded pairs to save I/O
+        self._class_cache = {} # blake2b(template) -> compiled strategy class
+        self._indicator_cache = OrderedDict() # (template, structural genes) -> indicator frame, LRU
+        self._indicator_misses = set() # templates whose indicators read unflagged genes
+        self._indicator_lock = threading.Lock()
 
     def load_data(self, pair: str, timeframe: str = "5m", days: int = 30) -> pd.DataFrame:
         """
         Loads OHLCV data from Freqtrade Feather files.
+        Feather files are read as Arrow tables and trimmed to the last `days` before pandas conversion.
         """
-        if pair in self.data_cache:
-            return self.data_cache[pair].copy()
+        cache_key = (pair, timeframe, days)
+        if cache_key in self.data_cache:
+            return self.data_cache[cache_key].copy()
 
         # Handle pair format: "BTC/USDT" -> "BTC_USDT"
         # Freqtrade futures filenames: "BTC_USDT_USDT-5m-futures.feather"
@@ -51,10 +135,10 @@ class VectorizedBacktester:
 
         try:
             if filepath.endswith(".feather"):
-                df = pd.read_feather(filepath)
+                df = self._read_feather_window(filepath, days)
             else:
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
+                with open(filepath, 'rb') as f:
+                    data = orjson.loads(f.read())
                 df = pd.DataFrame(data, columns=['date', 'open', 'high', 'low', 'close', 'volume'])
                 df['date'] = pd.to_datetime(df['date'], unit='ms')
             
@@ -67,73 +151,82 @@ class VectorizedBacktester:
                 start_date = df['date'].iloc[-1] - pd.Timedelta(days=days)
                 df = df[df['date'] >= start_date]
 
-            self.data_cache[pair] = df
+            self.data_cache[cache_key] = df
             return df
         except Exception as e:
             logger.error(f"Failed to load data for {pair}: {e}")
             return pd.DataFrame()
 
-    def run_simulation(self, dataframe: pd.DataFrame, strategy_template: str, parameters: dict) -> dict:
+    def _read_feather_window(self, filepath: str, days: int) -> pd.DataFrame:
+        """Reads only the OHLCV columns and filters to the date window at the Arrow level."""
+        table = feather.read_table(filepath, columns=OHLCV_COLUMNS, memory_map=True)
+        if days > 0 and table.num_rows:
+            last_date = table['date'][-1].as_py()
+            cutoff = pa.scalar(last_date - pd.Timedelta(days=days), type=table['date'].type)
+            table = table.filter(pc.greater_equal(table['date'], cutoff))
+        return table.to_pandas()
+
+    def prepare_indicators(self, dataframe: pd.DataFrame, strategy_template: str):
+        """
+        Runs populate_indicators once so every individual of a run can share the result.
+
+        Only self.p templates whose populate_indicators does not read any gene qualify.
+
+        Returns:
+            DataFrame with indicator columns, or None if the template needs per-call indicators.
+        """
+        if not _PARAM_DICT_RE.search(strategy_template):
+            return None
+        try:
+            StrategyClass = self._get_strategy_class(strategy_template)
+            if not StrategyClass:
+                return None
+            strategy = StrategyClass()
+            strategy.p = genes = _GeneReads() # Any gene read here means indicators depend on the individual
+            try:
+                df = strategy.populate_indicators(dataframe.copy(), {'pair': 'Generic'})
+            except KeyError:
+                if not genes.missed:
+                    raise
+            if genes.missed:
+                logger.info(f"Indicators depend on genes {sorted(genes.missed)}; computing them per simulation.")
+                return None
+            return df
+        except Exception as e:
+            logger.error(f"Indicator pre-computation failed: {e}")
+            return None
+
+    def clear_indicator_cache(self):
+        """Drops cached indicator frames; call when the underlying data changes."""
+        with self._indicator_lock:
+            self._indicator_cache.clear()
+            self._indicator_misses.clear()
+
+    def run_simulation(self, dataframe: pd.DataFrame, strategy_template: str, parameters: dict,
+                       indicators_ready: bool = False, indicator_keys: list = None) -> dict:
         """
         Injects parameters into the template and runs the simulation.
         
         Args:
-            dataframe: OHLCV DataFrame
-            strategy_template: String code with {placeholders}
+            dataframe: OHLCV DataFrame (already carrying indicators if indicators_ready)
+            strategy_template: Class source reading genes from self.p[...]
+                (legacy: String code with {placeholders})
             parameters: Dict of parameter values (e.g., {'rsi_buy': 30})
+            indicators_ready: dataframe comes from prepare_indicators; only signals are computed.
+            indicator_keys: Genes that affect populate_indicators. When given, indicator frames
+                are cached per combination of these genes and reused across calls.
             
         Returns:
             Dict with metrics (profit_ratio, max_drawdown, win_rate, total_trades)
         """
-        df = dataframe.copy()
-        
-        # 1. Populate Indicators (Dynamic Execution)
-        # We need a safe way to execute the logic. 
-        # For v3.0, we will assume the template provides logic strings we can eval,
-        # OR we inject the logic into a wrapper function.
-        
         # NOTE: Executing arbitrary code is risky. In a real system, we'd use an AST parser.
         # Here we trust the internal Architect.
-        
         try:
-            # Prepare gene values
-            # Replace placeholders in the code string is tricky if it's a full class.
-            # Simplified approach for v3.0: 
-            # The Architect returns logic snippets, e.g., "dataframe['rsi'] < {buy_rsi}"
-            # But the Architect returns a FULL CLASS.
-            
-            # PROPER APPROACH: Use 'exec' to define the class locally, then instantiate it.
-            # We need to inject the parameters into the class instance or replace them in source.
-            
-            # Regex replace matches of {var_name} with value
-            filled_code = strategy_template
-            for key, value in parameters.items():
-                if isinstance(value, str):
-                    filled_code = filled_code.replace(f"{{key}}", f"'{value}'")
-                else:
-                    filled_code = filled_code.replace(f"{{{key}}}", str(value))
-            
-            # Define namespace for execution
-            local_scope = {'pd': pd, 'np': np, 'ta': ta, 'DataFrame': pd.DataFrame}
-            
-            # Execute the class definition
-            exec(filled_code, globals(), local_scope)
-            
-            # Instantiate the strategy (Class name is fixed by Architect)
-            StrategyClass = local_scope.get('AEGIS_Strategy_Template')
-            if not StrategyClass:
-                logger.error("Strategy class not found in template.")
+            df = self._populate_signals(dataframe, strategy_template, parameters, indicators_ready,
+                                        indicator_keys)
+            if df is None:
                 return self._empty_result()
-                
-            strategy = StrategyClass()
-            
-            # 2. Populate Indicators
-            # We need to adapt Freqtrade's IStrategy methods to our lightweight runner
-            # Strategy expects 'dataframe' and 'metadata'
-            df = strategy.populate_indicators(df, {'pair': 'Generic'})
-            df = strategy.populate_entry_trend(df, {'pair': 'Generic'})
-            df = strategy.populate_exit_trend(df, {'pair': 'Generic'})
-            
+
             # 3. Vectorized Backtest Calculation
             return self._calculate_vectorized_metrics(df)
             
@@ -141,6 +234,142 @@ class VectorizedBacktester:
             logger.error(f"Simulation failed: {e}")
             return self._empty_result()
 
+    def simulate_signals(self, dataframe: pd.DataFrame, strategy_template: str, parameters: dict,
+                         indicators_ready: bool = False, indicator_keys: list = None):
+        """
+        Runs the strategy and returns only its signals, for batched simulation.
+
+        Returns:
+            (enter_long, exit_long) int8 arrays aligned to dataframe's rows, or None on failure.
+        """
+        try:
+            df = self._populate_signals(dataframe, strategy_template, parameters, indicators_ready,
+                                        indicator_keys)
+            if df is None or 'enter_long' not in df.columns or 'exit_long' not in df.columns:
+                return None
+            # Strategies may drop rows (e.g. dropna); realign so all individuals share one close array
+            signals = df[['enter_long', 'exit_long']].reindex(dataframe.index).fillna(0)
+            return (signals['enter_long'].to_numpy(np.int8),
+                    signals['exit_long'].to_numpy(np.int8))
+        except Exception as e:
+            logger.error(f"Simulation failed: {e}")
+            return None
+
+    def _populate_signals(self, dataframe: pd.DataFrame, strategy_template: str, parameters: dict,
+                          indicators_ready: bool, indicator_keys: list = None):
+        """Instantiates the strategy with the given genes and runs its populate_* methods."""
+        # 1. Populate Indicators (Dynamic Execution)
+        # We need a safe way to execute the logic. 
+        # For v3.0, we will assume the template provides logic strings we can eval,
+        # OR we inject the logic into a wrapper function.
+
+        # Prepare gene values
+        # Replace placeholders in the code string is tricky if it's a full class.
+        # Simplified approach for v3.0: 
+        # The Architect returns logic snippets, e.g., "dataframe['rsi'] < {buy_rsi}"
+        # But the Architect returns a FULL CLASS.
+        
+        # PROPER APPROACH: Use 'exec' to define the class locally, then instantiate it.
+        # We need to inject the parameters into the class instance or replace them in source.
+        
+        if _PARAM_DICT_RE.search(strategy_template):
+            # Genes are read from self.p at runtime: compile once, inject per call
+            StrategyClass = self._get_strategy_class(strategy_template)
+            if not StrategyClass:
+                logger.error("Strategy class not found in template.")
+                return None
+            strategy = StrategyClass()
+            strategy.p = parameters
+
+            if not indicators_ready and indicator_keys is not None:
+                cached = self._cached_indicators(dataframe, strategy_template, parameters, indicator_keys)
+                if cached is not None:
+                    dataframe, indicators_ready = cached, True
+        else:
+            # Legacy template: replace matches of {var_name} with value, exec per call
+            filled_code = fill_placeholders(strategy_template, parameters)
+
+            StrategyClass = self._exec_template(filled_code)
+            if not StrategyClass:
+                logger.error("Strategy class not found in template.")
+                return None
+            strategy = StrategyClass()
+        
+        if indicators_ready and _COPY_ON_WRITE:
+            # Shallow copy: indicator columns are shared (other threads read them too),
+            # pandas copies any column the template writes to
+            df = dataframe.copy(deep=False)
+        else:
+            df = dataframe.copy()
+
+        # 2. Populate Indicators
+        # We need to adapt Freqtrade's IStrategy methods to our lightweight runner
+        # Strategy expects 'dataframe' and 'metadata'
+        if not indicators_ready:
+            df = strategy.populate_indicators(df, {'pair': 'Generic'})
+        df = strategy.populate_entry_trend(df, {'pair': 'Generic'})
+        df = strategy.populate_exit_trend(df, {'pair': 'Generic'})
+        return df
+
+    def _cached_indicators(self, dataframe: pd.DataFrame, strategy_template: str, parameters: dict,
+                           indicator_keys: list):
+        """
+        Returns the indicator frame for the structural genes in parameters, computing it on a miss.
+        populate_indicators only sees those genes, so reading a mislabeled gene (even through
+        .get with a default) makes the template fall back to per-call indicators.
+        """
+        template_key = hashlib.blake2b(strategy_template.encode()).digest()
+        genes = {k: parameters[k] for k in indicator_keys if k in parameters}
+        key = (template_key, tuple(sorted(genes.items())))
+        with self._indicator_lock:
+            if template_key in self._indicator_misses:
+                return None
+            df = self._indicator_cache.get(key)
+            if df is not None:
+                self._indicator_cache.move_to_end(key)
+                return df
+
+        strategy = self._get_strategy_class(strategy_template)()
+        strategy.p = reads = _GeneReads(genes)
+        try:
+            df = strategy.populate_indicators(dataframe.copy(), {'pair': 'Generic'})
+        except KeyError:
+            if not reads.missed:
+                raise
+        if reads.missed:
+            logger.info(f"Indicators read genes {sorted(reads.missed)} not flagged affects_indicators; "
+                        "not caching them.")
+            with self._indicator_lock:
+                self._indicator_misses.add(template_key)
+            return None
+
+        with self._indicator_lock:
+            self._indicator_cache[key] = df
+            while len(self._indicator_cache) > INDICATOR_CACHE_SIZE:
+                self._indicator_cache.popitem(last=False)
+        return df
+
+    def _get_strategy_class(self, strategy_template: str):
+        """Returns the compiled class for a self.p template, exec'ing it only on first use."""
+        key = hashlib.blake2b(strategy_template.encode()).digest()
+        StrategyClass = self._class_cache.get(key)
+        if StrategyClass is None:
+            StrategyClass = self._exec_template(strategy_template)
+            if StrategyClass:
+                self._class_cache[key] = StrategyClass
+        return StrategyClass
+
+    def _exec_template(self, code: str):
+        """Executes a class definition and returns AEGIS_Strategy_Template (or None)."""
+        # Define namespace for execution
+        local_scope = {'pd': pd, 'np': np, 'ta': ta, 'DataFrame': pd.DataFrame}
+
+        # Execute the class definition
+        exec(code, globals(), local_scope)
+
+        # Class name is fixed by Architect
+        return local_scope.get('AEGIS_Strategy_Template')
+
     def _calculate_vectorized_metrics(self, df: pd.DataFrame) -> dict:
         """
         Calculates profit, drawdown etc from Signals.
@@ -148,56 +377,33 @@ class VectorizedBacktester:
         if 'enter_long' not in df.columns or 'exit_long' not in df.columns:
              return self._empty_result()
 
-        # Identify entries and exits
-        df['trade_entry'] = (df['enter_long'] == 1) & (df['enter_long'].shift(1) != 1)
-        df['trade_exit'] = (df['exit_long'] == 1) & (df['exit_long'].shift(1) != 1)
-        
-        # Simulation Loop (Vectorized-ish)
-        # Pure vectorization is hard for stateful trading (can't buy if already in trade).
-        # We iterate for accuracy, but using Numba would be faster. 
-        # For now, simple python loop over signals is fast enough for <10k rows.
-        
-        in_trade = False
-        entry_price = 0.0
-        trades = []
-        equity_curve = [100.0] # start with 100%
-        
-        # Optimization: Iterate only interesting rows
-        signals = df[(df['trade_entry']) | (df['trade_exit'])].copy()
-        
-        for index, row in signals.iterrows():
-            if not in_trade and row['trade_entry']:
-                in_trade = True
-                entry_price = row['close']
-            
-            elif in_trade and row['trade_exit']:
-                in_trade = False
-                exit_price = row['close']
-                profit = (exit_price - entry_price) / entry_price
-                trades.append(profit)
-                
-                # Update equity
-                last_equity = equity_curve[-1]
-                equity_curve.append(last_equity * (1 + profit))
+        # Simulation Loop
+        # Pure vectorization is hard for stateful trading (can't buy if already in trade),
+        # so the walk runs in a compiled kernel over raw arrays; entry/exit edges are
+        # detected inside it instead of via shift().
+        trades, equity_curve = simulate_trades(
+            df['enter_long'].fillna(0).to_numpy(np.int8),
+            df['exit_long'].fillna(0).to_numpy(np.int8),
+            df['close'].to_numpy(np.float32)
+        )
         
         # Metrics
-        if not trades:
+        if len(trades) == 0:
             return self._empty_result()
 
         total_profit = equity_curve[-1] - 100.0 # Percentage growth
         
         # Max Drawdown
-        equity_series = pd.Series(equity_curve)
-        rolling_max = equity_series.cummax()
-        drawdown = (equity_series - rolling_max) / rolling_max
+        rolling_max = np.maximum.accumulate(equity_curve)
+        drawdown = (equity_curve - rolling_max) / rolling_max
         max_drawdown = drawdown.min() # Negative number
         
-        win_rate = len([t for t in trades if t > 0]) / len(trades)
+        win_rate = np.count_nonzero(trades > 0) / len(trades)
         
         return {
-            "profit_ratio": total_profit / 100.0,
-            "max_drawdown": abs(max_drawdown),
-            "win_rate": win_rate,
+            "profit_ratio": float(total_profit / 100.0),
+            "max_drawdown": float(abs(max_drawdown)),
+            "win_rate": float(win_rate),
             "total_trades": len(trades)
         }
 
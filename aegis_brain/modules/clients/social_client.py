@@ -1,10 +1,16 @@
 import logging
-import google.generativeai as genai
+import time
+import orjson
+from google import genai
+from google.genai import types
 import os
 
 # Configure logging
 logger = logging.getLogger("SentimentSniper")
 
+# Scores for the same symbol set are reused for this long (seconds)
+HYPE_CACHE_TTL = 300
+
 class SocialClient:
     """
     Client for the Sentiment Sniper module.
@@ -17,13 +23,14 @@ class SocialClient:
     0.6 - 0.8: Greed
     0.8 - 1.0: Extreme Greed (Euphoria, "To the moon")
     """
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, client=None):
         self.api_key = api_key
+        self.model_name = 'gemini-1.5-flash'
+        self._cache = {} # sorted symbol tuple -> (monotonic time, {symbol: score})
         if api_key and api_key != "your_gemini_key_here":
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
+            self.client = client or genai.Client(api_key=api_key)
         else:
-            self.model = None
+            self.client = None
             logger.warning("Gemini API Key missing or invalid. Sentiment Sniper disabled.")
 
     async def analyze_hype(self, symbol: str = "Bitcoin") -> float:
@@ -31,8 +38,21 @@ class SocialClient:
         Analyzes recent news/social sentiment for the given symbol.
         Returns a normalized Hype Score (0-1).
         """
-        if not self.model:
-            return 0.5 # Neutral fallback
+        scores = await self.analyze_hype_batch([symbol])
+        return scores[symbol]
+
+    async def analyze_hype_batch(self, symbols: list[str]) -> dict[str, float]:
+        """
+        Scores several symbols with a single Gemini request.
+        Returns {symbol: Hype Score (0-1)}; symbols missing from the reply default to neutral.
+        """
+        if not self.client:
+            return {symbol: 0.5 for symbol in symbols} # Neutral fallback
+
+        key = tuple(sorted(set(symbols)))
+        cached = self._cache.get(key)
+        if cached and time.monotonic() - cached[0] < HYPE_CACHE_TTL:
+            return dict(cached[1])
 
         try:
             # In a full implementation, we would first fetch news headlines 
@@ -54,26 +74,33 @@ class SocialClient:
             You are a Crypto Sentiment Analyst.
             
             TASK:
-            Analyze the general sentiment for {symbol}. 
+            Analyze the general sentiment for each of: {', '.join(key)}.
             Since you cannot browse the live web right now, assume a "Neutral" market structure 
             unless you have specific recent data.
             
             OUTPUT:
-            Return ONLY a single float number between 0.0 and 1.0.
+            Return ONLY a JSON object mapping each name above to a float between 0.0 and 1.0.
             0.0 = Extreme Fear
             1.0 = Extreme Greed
             """
             
-            response = self.model.generate_content(prompt)
-            score_text = response.text.strip()
-            
-            try:
-                score = float(score_text)
-                return max(0.0, min(1.0, score))
-            except ValueError:
-                logger.error(f"Invalid sentiment score received: {score_text}")
-                return 0.5
+            response = await self.client.aio.models.generate_content(
+                model=self.model_name,
+                contents=prompt,
+                config=types.GenerateContentConfig(response_mime_type="application/json")
+            )
+            raw = orjson.loads(response.text)
+
+            scores = {}
+            for symbol in key:
+                try:
+                    scores[symbol] = max(0.0, min(1.0, float(raw[symbol])))
+                except (KeyError, TypeError, ValueError):
+                    logger.error(f"Invalid sentiment score received for {symbol}: {raw.get(symbol)}")
+                    scores[symbol] = 0.5
+            self._cache[key] = (time.monotonic(), scores)
+            return dict(scores)
 
         except Exception as e:
             logger.error(f"Error analyzing sentiment: {e}")
-            return 0.5
+            return {symbol: 0.5 for symbol in symbols}
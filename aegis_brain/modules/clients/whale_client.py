@@ -2,6 +2,7 @@ import os
 import logging
 import aiohttp
 import asyncio
+import numpy as np
 from datetime import datetime, timedelta
 
 # Configure logging
@@ -22,10 +23,15 @@ class WhaleClient:
         self.base_url = "https://api.whale-alert.io/v1"
         self.min_value_usd = min_value_usd
         self.session = None
+        # One pooled session for the client's lifetime: keep-alive and cached DNS across calls
+        self._connector_kwargs = {"limit": 64, "ttl_dns_cache": 300, "keepalive_timeout": 60}
 
     async def _get_session(self):
         if self.session is None:
-            self.session = aiohttp.ClientSession()
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(**self._connector_kwargs),
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
         return self.session
 
     async def close(self):
@@ -55,7 +61,7 @@ class WhaleClient:
             # start_time = int((datetime.now() - timedelta(hours=hours)).timestamp())
             # url = f"{self.base_url}/transactions?api_key={self.api_key}&start={start_time}&currency={symbol.lower()}&min_value={self.min_value_usd}"
             # async with (await self._get_session()).get(url) as response:
-            #     data = await response.json()
+            #     data = orjson.loads(await response.read())
             #     return self._calculate_score(data)
             
             logger.info(f"Fetching whale data for {symbol} (Simulated)...")
@@ -70,22 +76,19 @@ class WhaleClient:
         """
         Internal logic to process raw transaction list.
         """
-        inflow_usd = 0.0
-        outflow_usd = 0.0
-
         transactions = data.get("transactions", [])
-        for tx in transactions:
-            amount_usd = tx.get("amount_usd", 0)
-            from_type = tx.get("from", {}).get("owner_type", "unknown")
-            to_type = tx.get("to", {}).get("owner_type", "unknown")
+        amount_usd = np.fromiter((tx.get("amount_usd", 0) for tx in transactions),
+                                 dtype=np.float64, count=len(transactions))
+        from_exchange = np.fromiter((tx.get("from", {}).get("owner_type") == "exchange" for tx in transactions),
+                                    dtype=bool, count=len(transactions))
+        to_exchange = np.fromiter((tx.get("to", {}).get("owner_type") == "exchange" for tx in transactions),
+                                  dtype=bool, count=len(transactions))
 
-            # Inflow: Unknown/Wallet -> Exchange
-            if from_type != "exchange" and to_type == "exchange":
-                inflow_usd += amount_usd
-            
-            # Outflow: Exchange -> Unknown/Wallet
-            elif from_type == "exchange" and to_type != "exchange":
-                outflow_usd += amount_usd
+        # Inflow: Unknown/Wallet -> Exchange
+        inflow_usd = amount_usd[~from_exchange & to_exchange].sum()
+
+        # Outflow: Exchange -> Unknown/Wallet
+        outflow_usd = amount_usd[from_exchange & ~to_exchange].sum()
 
         net_flow = outflow_usd - inflow_usd
         
@@ -98,4 +101,4 @@ class WhaleClient:
         cap = 100_000_000 
         
         normalized = (net_flow / cap) / 2 + 0.5
-        return max(0.0, min(1.0, normalized))
+        return float(max(0.0, min(1.0, normalized)))
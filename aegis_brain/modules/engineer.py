@@ -1,7 +1,10 @@
 
+import os
 import logging
+import threading
+from multiprocessing.pool import ThreadPool
 import numpy as np
-from pymoo.core.problem import ElementwiseProblem
+from pymoo.core.problem import Problem
 from pymoo.algorithms.moo.nsga2 import NSGA2
 from pymoo.optimize import minimize
 from pymoo.operators.crossover.sbx import SBX
@@ -10,90 +13,144 @@ from pymoo.operators.sampling.rnd import FloatRandomSampling, IntegerRandomSampl
 from pymoo.termination import get_termination
 
 from .backtester import VectorizedBacktester
+from . import _bt_loop
 
 # Configure logging
 logger = logging.getLogger("AEGIS_Engineer")
 
-class StrategyOptimizationProblem(ElementwiseProblem):
+class StrategyOptimizationProblem(Problem):
     """
     Pymoo Problem definition for AEGIS Strategy Optimization.
+    The whole population is evaluated per call: signals per individual, then one batched simulation.
     Objectives:
     1. Maximize Profit (Minimize -Profit)
     2. Minimize Max Drawdown
     """
-    def __init__(self, template_code: str, param_defs: dict, dataframe, backtester: VectorizedBacktester):
+    def __init__(self, template_code: str, param_defs: dict, dataframe, backtester: VectorizedBacktester,
+                 indicators_ready: bool = False, indicator_keys: list = None, pool=None, **kwargs):
         self.template_code = template_code
         self.param_defs = param_defs
         self.dataframe = dataframe
         self.backtester = backtester
+        self.indicators_ready = indicators_ready
+        self.indicator_keys = indicator_keys
+        self.pool = pool
+        self.close = dataframe['close'].to_numpy(np.float32)
         self.param_keys = list(param_defs.keys())
+        n_var = len(self.param_keys)
         
         # Define Bounds
-        xl = [] # Lower bounds
-        xu = [] # Upper bounds
-        
-        for key in self.param_keys:
-            xl.append(param_defs[key]['low'])
-            xu.append(param_defs[key]['high'])
+        xl = np.fromiter((param_defs[k]['low'] for k in self.param_keys), dtype=np.float64, count=n_var)
+        xu = np.fromiter((param_defs[k]['high'] for k in self.param_keys), dtype=np.float64, count=n_var)
+        # Genes rounded to integers on decode
+        self._int_mask = np.fromiter((param_defs[k].get('type') == 'int' for k in self.param_keys),
+                                     dtype=bool, count=n_var)
             
-        super().__init__(n_var=len(self.param_keys),
+        super().__init__(n_var=n_var,
                          n_obj=2, # Profit, DD
                          n_ieq_constr=0,
-                         xl=np.array(xl),
-                         xu=np.array(xu))
-
-    def _evaluate(self, x, out, *args, **kwargs):
-        # 1. Map vector x back to named parameters
-        params = {}
-        for i, key in enumerate(self.param_keys):
-            val = x[i]
-            # Enforce types
-            if self.param_defs[key].get('type') == 'int':
-                params[key] = int(round(val))
-            else:
-                params[key] = float(val)
-                
-        # 2. Run Simulation
-        metrics = self.backtester.run_simulation(self.dataframe, self.template_code, params)
+                         xl=xl,
+                         xu=xu,
+                         **kwargs)
+
+    def _decode(self, x) -> dict:
+        """Maps vector x back to named parameters."""
+        # Enforce types
+        x = np.where(self._int_mask, np.rint(x), x)
+        return {
+            key: int(val) if is_int else float(val)
+            for key, val, is_int in zip(self.param_keys, x, self._int_mask)
+        }
+
+    def _signals(self, params: dict):
+        return self.backtester.simulate_signals(self.dataframe, self.template_code, params,
+                                                indicators_ready=self.indicators_ready,
+                                                indicator_keys=self.indicator_keys)
+
+    def _evaluate(self, X, out, *args, **kwargs):
+        # 1. Generate every individual's signals (strategy code is pandas, so this stays per-row)
+        mapper = self.pool.map if self.pool else map
+        signals = list(mapper(self._signals, [self._decode(x) for x in X]))
+
+        # Failed individuals keep all-zero signals, i.e. no trades
+        enter = np.zeros((len(X), len(self.close)), np.int8)
+        exit_ = np.zeros((len(X), len(self.close)), np.int8)
+        for i, sig in enumerate(signals):
+            if sig is not None:
+                enter[i], exit_[i] = sig
+
+        # 2. Run Simulation for the whole population in one kernel call
+        stats = _bt_loop.simulate_batch(enter, exit_, self.close)
         
         # 3. Define Objectives (Minimization)
         # Obj 1: Profit (We want Max Profit -> Min -Profit)
-        f1 = -1 * metrics['profit_ratio']
+        f1 = -stats[:, 0]
         
         # Obj 2: Drawdown (We want Min DD -> Min DD)
-        f2 = metrics['max_drawdown']
+        f2 = stats[:, 1].copy()
         
         # Penalize if 0 trades (force exploration)
-        if metrics['total_trades'] < 5:
-            f1 = 1.0 # High penalty
-            f2 = 1.0 # High penalty
+        penalized = stats[:, 2] < 5
+        f1[penalized] = 1.0 # High penalty
+        f2[penalized] = 1.0 # High penalty
 
-        out["F"] = [f1, f2]
+        out["F"] = np.column_stack([f1, f2])
         
 class Engineer:
     """
     The Engineer (Quantitative Optimizer).
     Runs Genetic Algorithms to refine the Architect's template.
     """
-    def __init__(self):
+    def __init__(self, preload_pairs=("BTC/USDT",)):
         # Update path to point to futures if detected, or passed via config
         # For now, default to checking known locations in Backtester or passed explicitly
         self.backtester = VectorizedBacktester(data_dir="/freqtrade/user_data/data/binance/futures")
+        # JIT-compile the simulation kernel up front, not inside the first generation.
+        # Kept on this thread: numba's parallel runtime must not be first started from a worker thread.
+        _bt_loop.warmup()
+        # Data loads in the background, overlapping the Architect's Gemini call
+        self._preload_thread = threading.Thread(target=self._preload, args=(preload_pairs,),
+                                                name="engineer-preload", daemon=True)
+        self._preload_thread.start()
 
-    def optimize_strategy(self, template_code: str, param_defs: dict, pair: str = "BTC/USDT", generations: int = 20, pop_size: int = 40):
+    def _preload(self, pairs):
+        """Loads the usual optimization data into the backtester cache."""
+        for pair in pairs:
+            self.backtester.load_data(pair, timeframe="5m", days=30)
+
+    def optimize_strategy(self, template_code: str, param_defs: dict, pair: str = "BTC/USDT", generations: int = 20, pop_size: int = 40,
+                          with_metrics: bool = False):
         """
         Executes the NSGA-II optimization loop.
+        Returns the winning genes, or (genes, metrics) when with_metrics is set.
         """
         logger.info(f"Engineer: Starting optimization for {pair} ({generations} gens, {pop_size} pop)...")
         
-        # 1. Load Data
+        # 1. Load Data (waits for the preload so the same file isn't read twice)
+        self._preload_thread.join()
         df = self.backtester.load_data(pair, timeframe="5m", days=30)
         if df.empty:
             logger.error("Engineer: No data found for optimization.")
             return None
 
+        # Indicators don't change between individuals: compute them once for the whole run
+        self.backtester.clear_indicator_cache()
+        base_df = self.backtester.prepare_indicators(df, template_code)
+        indicators_ready = base_df is not None
+        indicator_keys = None
+        if indicators_ready:
+            df = base_df
+        else:
+            # Some genes shape the indicators: cache them per combination of those genes only
+            indicator_keys = [k for k, d in param_defs.items() if d.get('affects_indicators')] or list(param_defs)
+
         # 2. Setup Problem
-        problem = StrategyOptimizationProblem(template_code, param_defs, df, self.backtester)
+        # Signal generation per individual runs on threads sharing the cached DataFrame;
+        # the trade simulation for the whole generation is one parallel kernel call.
+        pool = ThreadPool(min(os.cpu_count() or 1, pop_size))
+        problem = StrategyOptimizationProblem(template_code, param_defs, df, self.backtester,
+                                              indicators_ready=indicators_ready,
+                                              indicator_keys=indicator_keys, pool=pool)
         
         # 3. Setup Algorithm (NSGA-II)
         algorithm = NSGA2(
@@ -108,12 +165,16 @@ class Engineer:
         # 4. Run Optimization
         termination = get_termination("n_gen", generations)
         
-        res = minimize(problem,
-                       algorithm,
-                       termination,
-                       seed=1,
-                       save_history=False,
-                       verbose=True) # Verbose for logs
+        try:
+            res = minimize(problem,
+                           algorithm,
+                           termination,
+                           seed=1,
+                           save_history=False,
+                           verbose=True) # Verbose for logs
+        finally:
+            pool.close()
+            pool.join()
         
         logger.info(f"Engineer: Optimization complete. Time: {res.exec_time}s")
         
@@ -127,35 +188,40 @@ class Engineer:
         profits = -res.F[:, 0]
         drawdowns = res.F[:, 1]
         
-        best_idx = 0
-        best_score = -np.inf
-        
-        for i in range(len(profits)):
-            p = profits[i]
-            dd = drawdowns[i]
-            
-            # Simple Scoring: Profit / (DD + 0.01)
-            # Avoid divide by zero
-            score = p / (dd + 0.05) 
-            
-            if score > best_score:
-                best_score = score
-                best_idx = i
+        # Simple Scoring: Profit / (DD + 0.05), the offset avoids divide by zero
+        scores = profits / (drawdowns + 0.05)
+        best_idx = int(np.nanargmax(scores))
                 
         best_params_vector = res.X[best_idx]
-        best_metrics = {"profit": profits[best_idx], "drawdown": drawdowns[best_idx]}
+        best_metrics = {"profit": float(profits[best_idx]), "drawdown": float(drawdowns[best_idx]),
+                        "score": float(scores[best_idx])}
         
         # Map back to dict
-        final_params = {}
-        keys = list(param_defs.keys())
-        for i, key in enumerate(keys):
-             val = best_params_vector[i]
-             if param_defs[key].get('type') == 'int':
-                final_params[key] = int(round(val))
-             else:
-                final_params[key] = float(val)
+        final_params = problem._decode(best_params_vector)
                 
         logger.info(f"Engineer: Winner Selected! Profit: {best_metrics['profit']:.2%}, DD: {best_metrics['drawdown']:.2%}")
         logger.info(f"Genes: {final_params}")
         
+        if with_metrics:
+            return final_params, best_metrics
         return final_params
+
+# One Engineer per worker process (see init_worker / optimize_in_worker)
+_worker_engineer = None
+
+def init_worker(numba_threads: int = 1):
+    """
+    ProcessPoolExecutor initializer for optimizing several templates side by side.
+    Caps the simulation kernel's threads so the workers share the cores instead of
+    oversubscribing them, then builds this process's Engineer.
+    """
+    global _worker_engineer
+    if _bt_loop.HAVE_NUMBA:
+        import numba
+        numba.set_num_threads(max(1, min(numba_threads, numba.config.NUMBA_NUM_THREADS)))
+    _worker_engineer = Engineer()
+
+def optimize_in_worker(template_code: str, param_defs: dict, pair: str, generations: int):
+    """Runs Engineer.optimize_strategy in a worker process; returns (genes, metrics) or None."""
+    return _worker_engineer.optimize_strategy(template_code, param_defs, pair=pair,
+                                              generations=generations, with_metrics=True)
@@ -1,15 +1,21 @@
 import logging
 import json
 import os
+import re
 import shutil
+import time
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from google import genai
 from google.genai import types
 from datetime import datetime, timedelta
 
 # Import Neuro-Genetic Modules
-from .modules.architect import Architect
-from .modules.engineer import Engineer
+from .modules.architect import Architect, TEMPLATE_VARIANTS
+from .modules.engineer import Engineer, init_worker, optimize_in_worker
+from .modules.backtester import fill_placeholders
 from memory_manager import MemoryManager
 
 # Configure logging
@@ -24,11 +30,13 @@ class EvolutionEngine:
     2. Engineer (Pymoo): Quantitative Optimization -> Optimized Parameters
     3. Deploy: Compile and Hot-Swap
     """
-    def __init__(self, api_key):
+    def __init__(self, api_key, client=None, n_variants: int = TEMPLATE_VARIANTS):
         self.api_key = api_key
-        self.architect = Architect(api_key)
-        self.engineer = Engineer()
+        # Templates designed per cycle; more than one are optimized in parallel processes
+        self.n_variants = n_variants
         self.memory = MemoryManager()
+        self.architect = Architect(api_key, client=client)
+        self.engineer = Engineer()
 
         # Paths
         self.local_base_path = "/freqtrade/user_data"
@@ -46,25 +54,72 @@ class EvolutionEngine:
             "volatility": "HIGH"
         }
 
+    def _cycle_key(self, context: dict) -> str:
+        """Hash of everything a cycle starts from: context, deployed strategy and evolution history."""
+        current_file = os.path.join(self.strategies_path, f"{self.current_strategy}.py")
+        try:
+            with open(current_file, "rb") as f:
+                code_hash = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            code_hash = ""
+        payload = json.dumps(context, sort_keys=True) + code_hash + self.memory.get_history_context(limit=3)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
     def compile_strategy(self, template_code: str, parameters: dict, class_name: str = "AEGIS_Strategy") -> str:
         """
         Injects optimized parameters into the template and renames the class.
+        Placeholder templates are filled in place; self.p templates get a class-level `p` dict.
         """
-        code = template_code
-        
-        # 1. Inject Parameters
-        for key, value in parameters.items():
-            if isinstance(value, str):
-                code = code.replace(f"{{key}}", f"'{value}'")
-            else:
-                code = code.replace(f"{{{key}}}", str(value))
+        # 1. Inject Parameters (one pass; other braces in the code are left alone)
+        code = fill_placeholders(template_code, parameters)
                 
         # 2. Rename Class
         # Template usually has AEGIS_Strategy_Template
-        code = code.replace("class AEGIS_Strategy_Template", f"class {class_name}")
+        code = code.replace("class AEGIS_Strategy_Template", f"class {class_name}", 1)
+
+        # Templates reading self.p get the genes baked in as a class attribute
+        if "self.p[" in code:
+            code = re.sub(
+                rf"^(class {re.escape(class_name)}\b.*:\n)",
+                lambda m: f"{m.group(1)}    p = {parameters!r}\n",
+                code, count=1, flags=re.MULTILINE
+            )
         
         return code
 
+    def optimize_variants(self, variants: list, pair: str = "BTC/USDT", generations: int = 10):
+        """
+        Optimizes several templates at once, one worker process each, every template with
+        the full generation budget. Returns (template, genes) of the best weighted
+        Profit / (DD + 0.05) winner, or (None, None).
+        """
+        n_workers = min(len(variants), os.cpu_count() or 1)
+        # spawn, not fork: the parent already runs numba and pool threads.
+        # Each worker loads its own copy of the OHLCV window (to_pandas copies out of the Feather map).
+        best_template, best_params, best_score = None, None, float("-inf")
+        with ProcessPoolExecutor(max_workers=n_workers,
+                                 mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=init_worker,
+                                 initargs=(max(1, (os.cpu_count() or 1) // n_workers),)) as executor:
+            futures = {
+                executor.submit(optimize_in_worker, template, param_defs, pair, generations): i
+                for i, (template, param_defs) in enumerate(variants)
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Variant optimization failed: {e}")
+                    continue
+                if result is None:
+                    continue
+                params, metrics = result
+                logger.info(f"Variant optimized: Profit {metrics['profit']:.2%}, DD {metrics['drawdown']:.2%}")
+                if metrics["score"] > best_score:
+                    best_template, best_params, best_score = variants[futures[future]][0], params, metrics["score"]
+
+        return best_template, best_params
+
     def run_evolution_cycle(self):
         """
         Main Neuro-Genetic Loop.
@@ -74,22 +129,35 @@ class EvolutionEngine:
         # 1. Context Analysis
         context = self.analyze_current_performance()
         logger.info(f"Market Context: {context}")
+
+        cycle_key = self._cycle_key(context)
+        last_cycle = json.loads(self.memory.get_kv("last_evolution_cycle", "{}"))
+        # Inputs (context, deployed code, history) identical to the last completed cycle's
+        # would only reproduce it, however many weekly slots ago that was
+        if last_cycle.get("key") == cycle_key:
+            logger.info(f"No-op cycle: context, strategy and history unchanged since "
+                        f"{datetime.fromtimestamp(last_cycle.get('ts', 0)):%Y-%m-%d} ({cycle_key[:12]}).")
+            return
         
         # 2. The Architect (Design)
         logger.info("Step 1: Architect designing strategy template...")
-        history = self.memory.get_evolution_history(limit=3)
-        template, param_defs = self.architect.generate_strategy_template(context, history)
+        history = self.memory.get_history_context(limit=3)
+        variants = self.architect.generate_strategy_variants(context, history, self.n_variants)
         
-        if not template or not param_defs:
+        if not variants:
             logger.error("Architect failed to produce a valid design. Aborting.")
             return
 
-        logger.info(f"Architect Design Complete. Genes defined: {list(param_defs.keys())}")
+        logger.info(f"Architect Design Complete. Variants: {[list(defs.keys()) for _, defs in variants]}")
 
         # 3. The Engineer (Optimization)
         logger.info("Step 2: Engineer optimizing parameters with NSGA-II...")
         # Run optimization
-        optimized_params = self.engineer.optimize_strategy(template, param_defs, pair="BTC/USDT", generations=10)
+        if len(variants) == 1:
+            template, param_defs = variants[0]
+            optimized_params = self.engineer.optimize_strategy(template, param_defs, pair="BTC/USDT", generations=10)
+        else:
+            template, optimized_params = self.optimize_variants(variants, pair="BTC/USDT", generations=10)
         
         if not optimized_params:
             logger.error("Engineer failed to optimize. Aborting.")
@@ -101,15 +169,29 @@ class EvolutionEngine:
         logger.info("Step 3: Compiling and Deploying Strategy...")
         final_code = self.compile_strategy(template, optimized_params, self.current_strategy)
         
-        # Backup old strategy
+        # Backup old strategy: a hard link to the old inode, which the replace below leaves intact
         current_file = os.path.join(self.strategies_path, f"{self.current_strategy}.py")
+        backup_file = f"{current_file}.bak"
         if os.path.exists(current_file):
-            shutil.copy(current_file, f"{current_file}.bak")
-            
-        # Write new strategy
-        with open(current_file, 'w') as f:
+            try:
+                os.remove(backup_file)
+            except FileNotFoundError:
+                pass
+            try:
+                os.link(current_file, backup_file)
+            except OSError:
+                # e.g. a bind mount without hard link support
+                shutil.copy(current_file, backup_file)
+
+        # Write new strategy to a temp file and swap it in atomically,
+        # so Freqtrade's reload never sees a half-written file
+        tmp_file = f"{current_file}.tmp.{os.getpid()}"
+        with open(tmp_file, 'w') as f:
             f.write(final_code)
-            
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, current_file)
+
         # 5. Record History
         self.memory.store_evolution_attempt(
             strategy_name="v3.0_Genetically_Optimized",
@@ -117,6 +199,9 @@ class EvolutionEngine:
             passed=True,
             reason="Optimized by Engineer"
         )
+        # Keyed on the state this cycle leaves behind: the next one with nothing new is a no-op
+        self.memory.set_kv("last_evolution_cycle",
+                           json.dumps({"key": self._cycle_key(context), "ts": time.time()}))
             
         logger.info("=== EVOLUTION CYCLE COMPLETE: Strategy Updated ===")
 
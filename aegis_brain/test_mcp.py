@@ -2,10 +2,17 @@ import requests
 import os
 import json
 import sys
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Configuration
 MCP_URL = os.getenv("MCP_SERVER_URL", "http://mcp_wrapper:8000")
 
+# One keep-alive session for every call instead of a new connection per request
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_maxsize=4, max_retries=Retry(total=2, backoff_factor=0.1)))
+_SESSION.mount("https://", HTTPAdapter(pool_maxsize=4, max_retries=Retry(total=2, backoff_factor=0.1)))
+
 def test_tool(tool_name, args={}):
     print(f"Testing tool: {tool_name} with args: {args}")
     print(f"Target URL: {MCP_URL}/tools/call")
@@ -15,7 +22,7 @@ def test_tool(tool_name, args={}):
             "name": tool_name,
             "arguments": args
         }
-        resp = requests.post(f"{MCP_URL}/tools/call", json=payload)
+        resp = _SESSION.post(f"{MCP_URL}/tools/call", json=payload, timeout=(3, 30))
         
         print(f"Status Code: {resp.status_code}")
         
@@ -34,9 +41,12 @@ def test_tool(tool_name, args={}):
                     print(data[0]["text"])
         else:
             print(f"Error: {resp.text}")
+            # Surface 4xx/5xx as an exception after showing the server's message
+            resp.raise_for_status()
             
     except Exception as e:
         print(f"Exception: {e}")
+        raise
 
 if __name__ == "__main__":
     tool = sys.argv[1] if len(sys.argv) > 1 else "fetch_market_data"
@@ -1,6 +1,8 @@
+import asyncio
+import copy
 import unittest
-from datetime import datetime, timedelta
-from unittest.mock import MagicMock, patch
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
 import sys
 import os
 
@@ -10,10 +12,18 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from brain import AegisStrategist, CONFIG
 
 class TestAegisBrain(unittest.TestCase):
-    def setUp(self):
+    @classmethod
+    def setUpClass(cls):
+        # Built once for the whole class
         # Mock environment variables
         with patch.dict(os.environ, {"GEMINI_API_KEY": "test", "MCP_SERVER_URL": "http://test"}):
-            self.strategist = AegisStrategist()
+            cls.base_strategist = AegisStrategist()
+
+    def setUp(self):
+        # Shallow copy: tests replace attributes (evolver, mcp, memory) without touching the shared instance
+        self.strategist = copy.copy(self.base_strategist)
+        self.now = datetime(2023, 10, 1, 2, 0, 0, tzinfo=timezone.utc)
+        self.strategist._now = lambda: self.now
 
     def test_get_market_tag(self):
         # Test RSI Logic
@@ -23,14 +33,14 @@ class TestAegisBrain(unittest.TestCase):
         # Test default
         self.assertEqual(self.strategist.get_market_tag({}), "RSI_NEUTRAL")
 
-    @patch('brain.datetime')
-    def test_check_evolution_schedule_trigger(self, mock_datetime):
+    def test_check_evolution_schedule_trigger(self):
         # Mock time to Sunday 02:00
-        mock_now = datetime(2023, 10, 1, 2, 0, 0) # Oct 1 2023 is a Sunday
-        mock_datetime.utcnow.return_value = mock_now
+        mock_now = datetime(2023, 10, 1, 2, 0, 0, tzinfo=timezone.utc) # Oct 1 2023 is a Sunday
+        self.now = mock_now
         
-        # Mock evolver
+        # Mock evolver and memory (the trigger persists its timestamp)
         self.strategist.evolver = MagicMock()
+        self.strategist.memory = MagicMock()
         # Ensure last check was long ago
         self.strategist.last_evolution_check = mock_now - timedelta(days=1)
         
@@ -39,12 +49,12 @@ class TestAegisBrain(unittest.TestCase):
             self.strategist.check_evolution_schedule()
             
         self.strategist.evolver.run_evolution_cycle.assert_called_once()
+        self.strategist.memory.set_kv.assert_called_once_with("last_evolution_check", mock_now.isoformat())
 
-    @patch('brain.datetime')
-    def test_check_evolution_schedule_no_trigger(self, mock_datetime):
+    def test_check_evolution_schedule_no_trigger(self):
         # Mock time to Monday 02:00
-        mock_now = datetime(2023, 10, 2, 2, 0, 0) # Oct 2 2023 is a Monday
-        mock_datetime.utcnow.return_value = mock_now
+        mock_now = datetime(2023, 10, 2, 2, 0, 0, tzinfo=timezone.utc) # Oct 2 2023 is a Monday
+        self.now = mock_now
         
         self.strategist.evolver = MagicMock()
         
@@ -53,5 +63,24 @@ class TestAegisBrain(unittest.TestCase):
             
         self.strategist.evolver.run_evolution_cycle.assert_not_called()
 
+    def test_reconcile_outcomes_matches_first_trade_in_window(self):
+        snap_time = datetime(2023, 10, 1, 2, 0, 0)
+        trades = [
+            {'trade_id': 3, 'open_date': (snap_time + timedelta(hours=2)).isoformat(), 'profit_ratio': 0.1},
+            {'trade_id': 2, 'open_date': (snap_time + timedelta(minutes=20)).isoformat(), 'profit_ratio': -0.05},
+            {'trade_id': 1, 'open_date': (snap_time - timedelta(minutes=5)).isoformat(), 'profit_ratio': 0.2},
+        ]
+        self.strategist.mcp = MagicMock()
+        self.strategist.mcp.call_tool = AsyncMock(return_value=trades)
+        self.strategist.memory = MagicMock()
+        self.strategist.memory.get_unreconciled_snapshots.return_value = [
+            (10, snap_time.isoformat(), snap_time.timestamp()),
+            (11, (snap_time + timedelta(hours=5)).isoformat(), (snap_time + timedelta(hours=5)).timestamp()),
+        ]
+
+        asyncio.run(self.strategist.reconcile_outcomes())
+
+        self.strategist.memory.bulk_reconcile.assert_called_once_with([(10, -1.0, trades[1])])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,33 @@
+"""
+Dev helper: reports which search-tool protos the installed google.generativeai exposes.
+Run directly: python tools/inspect_genai.py
+"""
+import inspect
+
+def main():
+    import google.generativeai as genai
+    from google.generativeai import types
+    from google.generativeai import protos
+
+    print("GenAI Version:", genai.__version__)
+
+    print("\n--- Inspecting Tool Class ---")
+    print(inspect.signature(types.Tool))
+
+    print("\n--- Inspecting Protos Tool ---")
+    # Only the fields we care about, not the full dir() listing
+    for field in ('google_search', 'google_search_retrieval', 'function_declarations'):
+        print(f"protos.Tool.{field}: {'found' if hasattr(protos.Tool, field) else 'NOT found'}")
+
+    print("\n--- Inspecting Protos GoogleSearch ---")
+    # Check if GoogleSearch proto exists
+    if hasattr(protos, 'GoogleSearch'):
+        print("protos.GoogleSearch found!")
+    else:
+        print("protos.GoogleSearch NOT found")
+
+    if hasattr(protos, 'GoogleSearchRetrieval'):
+        print("protos.GoogleSearchRetrieval found!")
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@
 # --- Do not remove these imports ---
 import numpy as np
 import pandas as pd
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from pandas import DataFrame
 from typing import Optional, Union
@@ -32,9 +33,12 @@ from freqtrade.strategy import (
 
 # --------------------------------
 # Add your lib to import here
+import talib
 import talib.abstract as ta
 from technical import qtpylib
 
+from _indicators import HAVE_NUMBA, rsi_wilder, rsi_batch, typical_price, bb_numpy
+
 class AEGIS_Strategy(IStrategy):
     """
     AEGIS Living Strategy (Project Genesis).
@@ -93,6 +97,20 @@ class AEGIS_Strategy(IStrategy):
     # Optional order time in force.
     order_time_in_force = {"entry": "GTC", "exit": "GTC"}
 
+    # populate_indicators results keyed by (pair, last candle, length). Unchanged candles are analysed
+    # again on every loop (process_only_new_candles = False) and reuse them instead of recomputing.
+    _indicator_cache: OrderedDict = OrderedDict()
+    indicator_cache_size = 32
+    # Run modes that analyse every pair once and never chart the dataframe
+    # (bb_middleband is only there for plot_config)
+    offline_runmodes = ('hyperopt', 'backtest')
+    # Indicator settings, shared by populate_indicators and the batched advise_all_indicators
+    rsi_period = 14
+    bb_window = 20
+    bb_stds = 2
+    # RSI columns from the batched kernel, keyed like the cache; only set inside advise_all_indicators
+    _batched_rsi = None
+
     # --------------------------------------------------------------------------
     # [GENOME SECTION] - Hyperoptable Parameters
     # The Evolution Engine should introduce/remove genes here.
@@ -121,6 +139,69 @@ class AEGIS_Strategy(IStrategy):
         """
         return []
 
+    def _indicator_key(self, pair: str, dataframe: DataFrame) -> tuple:
+        return (pair, dataframe['date'].iloc[-1], len(dataframe))
+
+    def _offline(self) -> bool:
+        runmode = getattr(self, 'config', {}).get('runmode')
+        return getattr(runmode, 'value', runmode) in self.offline_runmodes
+
+    def _trim_indicator_cache(self):
+        while len(self._indicator_cache) > self.indicator_cache_size:
+            self._indicator_cache.popitem(last=False)
+
+    def advise_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        """
+        Memoizes the whole indicator frame, so every column populate_indicators adds or changes
+        is reused on a hit, whatever the evolved method body looks like.
+        """
+        # With process_only_new_candles Freqtrade already skips unchanged candles, and
+        # backtesting / hyperopt analyse each pair once: nothing to reuse
+        if self.process_only_new_candles or self._offline() or not len(dataframe):
+            return super().advise_indicators(dataframe, metadata)
+        cache_key = self._indicator_key(metadata.get('pair'), dataframe)
+        cached = self._indicator_cache.get(cache_key)
+        if cached is not None:
+            self._indicator_cache.move_to_end(cache_key)
+            return cached.copy()
+        dataframe = super().advise_indicators(dataframe, metadata)
+        self._indicator_cache[cache_key] = dataframe.copy()
+        self._trim_indicator_cache()
+        return dataframe
+
+    def advise_all_indicators(self, data: dict) -> dict:
+        """
+        Backtesting / hyperopt: indicators for every pair before any signals.
+        With numba, the RSI of all pairs is computed in one parallel kernel call up front;
+        populate_indicators still runs for every pair and takes its RSI from there.
+        """
+        frames = [(pair, df) for pair, df in data.items() if len(df)]
+        if HAVE_NUMBA and len(frames) > 1:
+            offsets = np.cumsum([0] + [len(df) for _, df in frames])
+            close32 = np.concatenate([df['close'].to_numpy(dtype=np.float32) for _, df in frames])
+            rsi = rsi_batch(close32, offsets, self.rsi_period)
+            self._batched_rsi = {
+                self._indicator_key(pair, df): rsi[start:end]
+                for (pair, df), start, end in zip(frames, offsets[:-1], offsets[1:])
+            }
+        try:
+            return super().advise_all_indicators(data)
+        finally:
+            self._batched_rsi = None
+
+    def _rsi(self, dataframe: DataFrame, metadata: dict) -> np.ndarray:
+        """RSI of the close (rsi_period) as float32, from the batched kernel when it already ran."""
+        if self._batched_rsi:
+            rsi = self._batched_rsi.pop(self._indicator_key(metadata.get('pair'), dataframe), None)
+            if rsi is not None:
+                return rsi
+        if HAVE_NUMBA:
+            return rsi_wilder(np.ascontiguousarray(dataframe['close'].to_numpy(), dtype=np.float32),
+                              self.rsi_period)
+        # TA-Lib's function API straight on the array, without the abstract API's DataFrame handling
+        return talib.RSI(dataframe['close'].to_numpy(dtype=np.float64),
+                         timeperiod=self.rsi_period).astype(np.float32)
+
     def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
         """
         Adds several different TA indicators to the given DataFrame
@@ -129,13 +210,20 @@ class AEGIS_Strategy(IStrategy):
         - Use TA-Lib abstract (ta.EMA, ta.RSI, etc.)
         """
         # [GENE] RSI
-        dataframe['rsi'] = ta.RSI(dataframe, timeperiod=14)
+        # Indicator columns are float32: half the memory traffic, and plenty for threshold comparisons
+        dataframe['rsi'] = self._rsi(dataframe, metadata)
+
+        # Typical price once, as a plain array; other price-based genes can reuse `tp`
+        tp = typical_price(dataframe['high'].to_numpy(), dataframe['low'].to_numpy(),
+                            dataframe['close'].to_numpy())
 
         # [GENE] Bollinger Bands
-        bollinger = qtpylib.bollinger_bands(qtpylib.typical_price(dataframe), window=20, stds=2)
-        dataframe['bb_lowerband'] = bollinger['lower']
-        dataframe['bb_middleband'] = bollinger['mid']
-        dataframe['bb_upperband'] = bollinger['upper']
+        lower, mid, upper = bb_numpy(tp, window=self.bb_window, stds=self.bb_stds, dtype=np.float32)
+        dataframe['bb_lowerband'] = lower
+        # Only charted, never traded on: skipped in hyperopt / backtesting
+        if not self._offline():
+            dataframe['bb_middleband'] = mid
+        dataframe['bb_upperband'] = upper
         
         # [GENE] Volume Check
         # dataframe['volume_mean'] = dataframe['volume'].rolling(24).mean()
@@ -147,16 +235,20 @@ class AEGIS_Strategy(IStrategy):
         Based on TA indicators, populates the entry signal for the given dataframe
         [EVOLUTION NOTE]: Define Entry Logic based on current Market Context (Bull/Bear/Crab).
         """
-        dataframe.loc[
-            (
-                # Signal: RSI Oversold
-                (dataframe['rsi'] < self.buy_rsi.value) &
-                # Signal: Price below Lower Bollinger Band
-                (dataframe['close'] < dataframe['bb_lowerband']) &
-                # Guardrail: Volume exists
-                (dataframe['volume'] > 0)
-            ),
-            'enter_long'] = 1
+        # Gene read once, as a plain int
+        buy_rsi = int(self.buy_rsi.value)
+
+        # Plain arrays, most selective predicate first; the rest are ANDed in place
+        # and skipped entirely when nothing is oversold
+        # Signal: RSI Oversold
+        signal = dataframe['rsi'].to_numpy() < buy_rsi
+        if signal.any():
+            # Signal: Price below Lower Bollinger Band
+            signal &= dataframe['close'].to_numpy() < dataframe['bb_lowerband'].to_numpy()
+            # Guardrail: Volume exists
+            signal &= dataframe['volume'].to_numpy() > 0
+        # Whole column at once (0/1), not a sparse .loc write
+        dataframe['enter_long'] = signal.view(np.int8)
 
         return dataframe
 
@@ -165,16 +257,18 @@ class AEGIS_Strategy(IStrategy):
         Based on TA indicators, populates the exit signal for the given dataframe
         [EVOLUTION NOTE]: Define Exit Logic (Profit Taking).
         """
-        dataframe.loc[
-            (
-                # Signal: RSI Overbought
-                (dataframe['rsi'] < self.sell_rsi.value) &
-                # Signal: Price above Upper Bollinger Band
-                (dataframe['close'] > dataframe['bb_upperband']) &
-                # Guardrail: Volume exists
-                (dataframe['volume'] > 0) 
-            ),
-            'exit_long'] = 1
+        sell_rsi = int(self.sell_rsi.value)
+
+        # Plain arrays, most selective predicate first (see populate_entry_trend)
+        # Signal: Price above Upper Bollinger Band
+        signal = dataframe['close'].to_numpy() > dataframe['bb_upperband'].to_numpy()
+        if signal.any():
+            # Signal: RSI Overbought
+            signal &= dataframe['rsi'].to_numpy() > sell_rsi
+            # Guardrail: Volume exists
+            signal &= dataframe['volume'].to_numpy() > 0
+        # Whole column at once (0/1), not a sparse .loc write
+        dataframe['exit_long'] = signal.view(np.int8)
 
         return dataframe
 
@@ -0,0 +1,129 @@
+"""
+Indicator kernels for AEGIS_Strategy, kept out of the strategy file the Evolver rewrites.
+Freqtrade puts the strategies directory on sys.path while loading a strategy, so
+`from _indicators import ...` resolves to this file.
+"""
+import threading
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # callers fall back to TA-Lib / plain NumPy
+    HAVE_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+@njit("float32[:](float32[:], int64)", cache=True, nogil=True)
+def rsi_wilder(close, n):
+    """
+    Wilder's RSI in one pass, same values as talib.RSI(close, timeperiod=n):
+    NaN for the first n candles, seeded with the simple average of the first n changes.
+    float32 in and out; the running averages are kept in float64.
+    """
+    out = np.full(close.shape[0], np.nan, dtype=np.float32)
+    if close.shape[0] <= n:
+        return out
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, n + 1):
+        change = float(close[i]) - float(close[i - 1])
+        if change > 0:
+            avg_gain += change
+        else:
+            avg_loss -= change
+    avg_gain /= n
+    avg_loss /= n
+    total = avg_gain + avg_loss
+    out[n] = 100.0 * avg_gain / total if total > 0 else 0.0
+    for i in range(n + 1, close.shape[0]):
+        change = float(close[i]) - float(close[i - 1])
+        avg_gain = (avg_gain * (n - 1) + max(change, 0.0)) / n
+        avg_loss = (avg_loss * (n - 1) + max(-change, 0.0)) / n
+        total = avg_gain + avg_loss
+        out[i] = 100.0 * avg_gain / total if total > 0 else 0.0
+    return out
+
+
+@njit(parallel=True, cache=True)
+def rsi_batch(close, offsets, n):
+    """
+    rsi_wilder for several pairs at once, one pair per thread.
+    Pairs are float32 closes concatenated end to end; pair i spans offsets[i]:offsets[i + 1].
+    """
+    out = np.empty(close.shape[0], dtype=np.float32)
+    for p in prange(offsets.shape[0] - 1):
+        start = offsets[p]
+        end = offsets[p + 1]
+        out[start:end] = rsi_wilder(close[start:end], n)
+    return out
+
+
+def typical_price(high, low, close):
+    """(high + low + close) / 3 as a float64 array, built in place in one buffer."""
+    tp = np.add(high, low, dtype=np.float64)
+    tp += close
+    tp /= 3.0
+    return tp
+
+
+# Per-thread work buffers for bb_numpy, reused while the candle count and window stay the same
+_scratch = threading.local()
+
+
+def _bb_scratch(n: int, window: int):
+    """Window bounds and float64 work arrays for bb_numpy; the bounds only depend on n and window."""
+    scratch = getattr(_scratch, 'bb', None)
+    if scratch is None or scratch[0] != (n, window):
+        end = np.arange(1, n + 1)
+        start = np.maximum(end - window, 0)
+        count = (end - start).astype(np.float64)
+        scratch = ((n, window), end, start, count, count - 1,
+                   np.empty(n + 1), np.empty(n + 1), np.empty(n), np.empty(n))
+        _scratch.bb = scratch
+    return scratch[1:]
+
+
+def bb_numpy(series, window: int = 20, stds: float = 2.0, dtype=np.float64):
+    """
+    Bollinger Bands of a float64 series (normally typical_price) from running sums,
+    in a few passes over plain arrays.
+    Same values as qtpylib.bollinger_bands(series, window, stds): the first
+    window - 1 candles use what is available so far, std is the sample std (ddof=1).
+    Sums are always accumulated in float64; returns (lower, mid, upper) as new `dtype` arrays.
+    """
+    tp = np.asarray(series, dtype=np.float64)
+    n = len(tp)
+    end, start, count, dof, csum, csum2, x, var = _bb_scratch(n, window)
+    # Deviations from the series mean keep E[X^2] - E[X]^2 from cancelling at BTC price levels
+    shift = tp.mean() if n else 0.0
+    np.subtract(tp, shift, out=x)
+    csum[0] = csum2[0] = 0.0
+    np.cumsum(x, out=csum[1:])
+    np.multiply(x, x, out=x)
+    np.cumsum(x, out=csum2[1:])
+
+    # x is free again: window sums
+    total = np.take(csum, end, out=x)
+    total -= csum[start]
+    mid = total / count
+    np.take(csum2, end, out=var)
+    var -= csum2[start]
+    var -= total * mid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var /= dof
+    np.maximum(var, 0.0, out=var)
+    std = np.sqrt(var, out=var)
+    std *= stds
+
+    mid += shift
+    return (
+        np.subtract(mid, std, out=x).astype(dtype),
+        mid.astype(dtype, copy=False),
+        np.add(mid, std, out=x).astype(dtype),
+    )
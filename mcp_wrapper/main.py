@@ -1,11 +1,15 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+import msgspec
 import os
 import logging
 import asyncio
-from contextlib import asynccontextmanager
+import anyio
+from contextlib import asynccontextmanager, AsyncExitStack
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,9 +21,9 @@ if not FREQTRADE_API_URL:
     FREQTRADE_API_URL = "http://freqtrade:8080"
 FREQTRADE_USERNAME = os.getenv("FREQTRADE_USERNAME", "freqtrader")
 FREQTRADE_PASSWORD = os.getenv("FREQTRADE_PASSWORD", "maceda")
+# Seconds between attempts to (re)start the persistent MCP session
+MCP_RECONNECT_DELAY = 5
 
-# Global session
-session: ClientSession | None = None
 server_params = StdioServerParameters(
     command="python",
     args=["__main__.py"], # Run the entry point directly
@@ -31,22 +35,90 @@ server_params = StdioServerParameters(
     }
 )
 
+def _is_transport_error(e: Exception) -> bool:
+    """True when the MCP server process or its pipes are gone, as opposed to a failed tool call."""
+    if isinstance(e, McpError):
+        return e.error.code == CONNECTION_CLOSED
+    return isinstance(e, (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream, OSError))
+
+async def keep_session(app: FastAPI, ready: asyncio.Event):
+    """
+    Owns the persistent MCP session: opens it, and reopens it whenever it is lost
+    (server exit, or a request reporting a dead transport via app.state.reconnect).
+    Opened and closed in this one task: the stdio client's task group must exit in the task that entered it.
+    """
+    while True:
+        app.state.reconnect.clear()
+        try:
+            async with AsyncExitStack() as stack:
+                read, write = await stack.enter_async_context(stdio_client(server_params))
+                session = await stack.enter_async_context(ClientSession(read, write))
+                await session.initialize()
+                app.state.session = session
+                logger.info("Persistent MCP session up.")
+                ready.set()
+                await app.state.reconnect.wait()
+                app.state.session = None
+        except Exception as e:
+            app.state.session = None
+            logger.error(f"Persistent MCP session unavailable, connecting per request: {e}")
+        ready.set()
+        await asyncio.sleep(MCP_RECONNECT_DELAY)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting MCP Bridge...")
-    # We can't easily keep a persistent stdio connection in a simple variable 
-    # because stdio_client is a context manager.
-    # For this MVP, we might need to connect per request or use a long-running task.
-    # However, stdio_client is designed to be used with 'async with'.
-    # Let's try to keep it open.
+    # One MCP server process and session for the app's lifetime instead of a spawn + handshake per request
+    app.state.session = None
+    app.state.reconnect = asyncio.Event()
+    ready = asyncio.Event()
+    supervisor = asyncio.create_task(keep_session(app, ready))
+    await ready.wait() # First attempt done, up or not
     yield
     # Shutdown
     logger.info("Shutting down MCP Bridge...")
+    supervisor.cancel()
+    await asyncio.gather(supervisor, return_exceptions=True)
+    app.state.session = None
+
+@asynccontextmanager
+async def oneoff_session():
+    """A fresh MCP server process and session for a single request."""
+    async with stdio_client(server_params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            yield session
 
-app = FastAPI(title="AEGIS Bridge (MCP Server)", version="0.2.0", lifespan=lifespan)
+async def call_mcp(op):
+    """
+    Awaits op(session) on the persistent session when it is up, otherwise on a one-off connection.
+    If the persistent session turns out to be dead, keep_session is told to reconnect; a call
+    that never reached the server is retried once on a one-off connection (one that may have
+    run, e.g. a trade, is not). Requests share the persistent session concurrently;
+    ClientSession matches responses by request id.
+    """
+    session = app.state.session
+    if session is not None:
+        try:
+            return await op(session)
+        except Exception as e:
+            if not _is_transport_error(e):
+                raise
+            if app.state.session is session:
+                logger.warning(f"Persistent MCP session lost, reconnecting: {e!r}")
+                app.state.session = None
+                app.state.reconnect.set()
+            if not isinstance(e, (anyio.ClosedResourceError, anyio.BrokenResourceError)):
+                raise
+    async with oneoff_session() as session:
+        return await op(session)
 
-class ToolCall(BaseModel):
+app = FastAPI(title="AEGIS Bridge (MCP Server)", version="0.2.0", lifespan=lifespan,
+              default_response_class=ORJSONResponse)
+
+# Decoded straight from the request body by msgspec, bypassing pydantic validation
+class ToolCall(msgspec.Struct):
     name: str
     arguments: dict = {}
 
@@ -57,33 +129,31 @@ async def root():
 @app.get("/tools")
 async def list_tools():
     try:
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                tools = await session.list_tools()
-                # Convert to simple list of dicts for brain.py
-                return [
-                    {
-                        "name": tool.name,
-                        "description": tool.description,
-                        "inputSchema": tool.inputSchema
-                    } for tool in tools.tools
-                ]
+        tools = await call_mcp(lambda session: session.list_tools())
+        # Convert to simple list of dicts for brain.py
+        return [
+            {
+                "name": tool.name,
+                "description": tool.description,
+                "inputSchema": tool.inputSchema
+            } for tool in tools.tools
+        ]
     except Exception as e:
         logger.error(f"Error listing tools: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/tools/call")
-async def call_tool(call: ToolCall):
+async def call_tool(request: Request):
     try:
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                result = await session.call_tool(call.name, arguments=call.arguments)
-                # Result is a CallToolResult object
-                # brain.py expects a JSON response, maybe just the content?
-                # Let's return the content list
-                return result.content
+        call = msgspec.json.decode(await request.body(), type=ToolCall)
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        result = await call_mcp(lambda session: session.call_tool(call.name, arguments=call.arguments))
+        # Result is a CallToolResult object
+        # brain.py expects a JSON response, maybe just the content?
+        # Let's return the content list
+        return result.content
     except Exception as e:
         logger.error(f"Error calling tool {call.name}: {e}")
         raise HTTPException(status_code=500, detail=str(e))